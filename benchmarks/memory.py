@@ -0,0 +1,86 @@
+"""
+Measures the memory used by each episode and each torrent candidate.
+
+Shared objects (e.g. interned titles) are only counted once, so the figures
+are the average cost of holding many of these objects at the same time.
+
+Usage: python benchmarks/memory.py [count]
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from nab.files import Torrent
+from nab.season import Season
+from nab.episode import Episode
+
+
+# references back up the show tree are not part of an element's cost
+_skip_attrs = set(["parent"])
+
+
+def _attributes(obj):
+    values = list(getattr(obj, "__dict__", {}).items())
+    for cls in type(obj).__mro__:
+        for name in getattr(cls, "__slots__", ()):
+            if name not in _skip_attrs and hasattr(obj, name):
+                values.append((name, getattr(obj, name)))
+    return [v for k, v in values if k not in _skip_attrs]
+
+
+def deep_size(objs):
+    seen = set()
+    size = 0
+    stack = list(objs)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or obj is None:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif not isinstance(obj, (basestring, int, long, float, bool)):
+            if hasattr(obj, "__dict__"):
+                size += sys.getsizeof(obj.__dict__)
+            stack.extend(_attributes(obj))
+    return size
+
+
+def episodes(count):
+    season = Season(None, 1, "Show")
+    for num in range(1, count + 1):
+        season[num] = Episode(season, num, "Episode %d" % (num % 50),
+                              1400000000.0 + num)
+    return season.values()
+
+
+def candidates(count):
+    # every filename is different, as results from feeds mostly are,
+    # so nothing is shared by the parse caches
+    torrents = [Torrent("Show %d S01E%02d 720p HDTV x264-GROUP%d"
+                        % (n, n % 100, n),
+                        "http://example.com/%d.torrent" % n, None, n % 20)
+                for n in range(count)]
+    # fields are read while checking and ranking candidates
+    for t in torrents:
+        t.title, t.tags
+    return torrents
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    eps = episodes(count)
+    print "bytes per episode:   %.1f" % (float(deep_size(eps)) / count)
+
+    torrents = candidates(count)
+    print "bytes per candidate: %.1f" % (float(deep_size(torrents)) / count)
+
+if __name__ == '__main__':
+    main()
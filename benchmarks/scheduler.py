@@ -0,0 +1,66 @@
+"""
+Times the timed scheduler queue with many queued tasks.
+
+Every task is pushed, pushed again later (ignored), brought forward,
+cancelled or popped, as happens when find_file tasks are rescheduled on
+every refresh.
+
+Usage: python benchmarks/scheduler.py [count]
+"""
+import sys
+import os
+import random
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from nab.scheduler import _SchedQueueTimed
+
+
+def _timed(name, count, func):
+    start = time.time()
+    func()
+    elapsed = time.time() - start
+    print "%-12s %8.3fs %8.2fus/op" % (name, elapsed,
+                                       elapsed * 1e6 / max(count, 1))
+
+
+def main(count):
+    rand = random.Random(0)
+    tasks = [("find_file", (("show_entry", ("Show%d" % (i % 1000),
+                                             i // 1000)), True))
+             for i in xrange(count)]
+    times = [rand.uniform(0, 1e6) for i in xrange(count)]
+    queue = _SchedQueueTimed('timed')
+
+    def push():
+        for dtime, (action, argument) in zip(times, tasks):
+            queue.push(dtime, action, argument)
+
+    def push_later():
+        for dtime, (action, argument) in zip(times, tasks):
+            queue.push(dtime + 1, action, argument)
+
+    def push_sooner():
+        for dtime, (action, argument) in zip(times, tasks):
+            queue.push(dtime - rand.uniform(0, 1e5), action, argument)
+
+    cancelled = tasks[::10]
+
+    def cancel():
+        for action, argument in cancelled:
+            queue.remove(action, argument)
+
+    def pop():
+        while len(queue):
+            queue.pop()
+
+    _timed("push", count, push)
+    _timed("push later", count, push_later)
+    _timed("push sooner", count, push_sooner)
+    _timed("cancel", len(cancelled), cancel)
+    _timed("pop", count - len(cancelled), pop)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
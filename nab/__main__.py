@@ -26,6 +26,11 @@ if config.options.clean:
         os.remove(scheduler.schedule_file)
     except Exception:
         pass
+    for gen, path in scheduler.journal_files():
+        try:
+            os.remove(path)
+        except Exception:
+            pass
     try:
         os.remove(libtorrent_downloader.libtorrent_file)
     except Exception:
@@ -58,6 +63,7 @@ def refresh():
     shows.save()
 
 scheduler.tasks["refresh"] = refresh
+scheduler.exclusive.add("refresh")
 
 
 def update_shows():
@@ -66,6 +72,7 @@ def update_shows():
     shows.update_data()
 
 scheduler.tasks["update_shows"] = update_shows
+scheduler.exclusive.add("update_shows")
 
 config.init()
 
@@ -90,7 +97,8 @@ else:
     try:
         # start nabbing shows
         renamer.init(shows)
-        scheduler.init(shows)
+        downloader.init(shows)
+        scheduler.init(shows, config.config["settings"].get("workers"))
         server.init(shows)
 
         # add command to refresh data
@@ -103,6 +111,9 @@ else:
         # add command to check download progress
         scheduler.scheduler.add_asap("check_downloads")
 
+        # log scheduler statistics every so often
+        scheduler.scheduler.add(10 * 60, "log_stats")
+
         # start server
         server.run()
     except KeyboardInterrupt:
@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+
+class LRUCache(object):
+    """
+    Size-bounded, thread-safe mapping that evicts the least recently used
+    entry when full. Counts hits and misses so the cache can be sized.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            # re-insert to mark as most recently used
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "size": len(self._data), "maxsize": self.maxsize}
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+
+_missing = object()
+
+
+def lru_memoized(maxsize=1024):
+    """
+    Memoize a function of hashable arguments in an LRUCache.
+    The cache is available as the 'cache' attribute of the function.
+    """
+    def decorator(func):
+        cache = LRUCache(maxsize)
+
+        @wraps(func)
+        def wrapper(*args):
+            result = cache.get(args, _missing)
+            if result is _missing:
+                result = func(*args)
+                cache.put(args, result)
+            return result
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+
+class ExpiringSet(object):
+    """
+    Set of hashable keys, each kept until its own expiry time.
+    If given a path, keys are loaded from and saved to that file.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._expiry = None
+        self._changed = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        # loaded when first needed
+        if self._expiry is not None:
+            return self._expiry
+        self._expiry = {}
+        if self.path is not None:
+            try:
+                with open(self.path, 'r') as f:
+                    entries = json.load(f)
+            except (IOError, ValueError):
+                entries = []
+            now = time.time()
+            for key, expiry in entries:
+                if expiry > now:
+                    self._expiry[tuple(key)] = expiry
+        return self._expiry
+
+    def add(self, key, ttl):
+        with self._lock:
+            self._load()[key] = time.time() + ttl
+            self._changed = True
+
+    def discard(self, key):
+        with self._lock:
+            if self._load().pop(key, None) is not None:
+                self._changed = True
+
+    def __contains__(self, key):
+        with self._lock:
+            expiry = self._load().get(key)
+        return expiry is not None and expiry > time.time()
+
+    def __len__(self):
+        with self._lock:
+            now = time.time()
+            return len([e for e in self._load().values() if e > now])
+
+    def save(self):
+        with self._lock:
+            if self.path is None or not self._changed:
+                return
+            now = time.time()
+            entries = [[list(key), expiry]
+                       for key, expiry in self._load().items()
+                       if expiry > now]
+            self._changed = False
+
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(entries, f)
+            try:
+                os.rename(tmp_path, self.path)
+            except OSError:
+                # can't rename over an existing file on windows
+                os.remove(self.path)
+                os.rename(tmp_path, self.path)
@@ -71,12 +71,16 @@ def _load_config():
 
     return c, a
 config, accounts = _load_config()
+# incremented on every reload, so anything built from the config can
+# tell when it is out of date
+version = 0
 
 
 def reload_config():
     _log.info('Reloading config and accounts files')
-    global config, accounts
+    global config, accounts, version
     config, accounts = _load_config()
+    version += 1
 tasks["load_config"] = reload_config
 
 
@@ -38,7 +38,7 @@ def get_data(show):
     # get all titles for show
     _log.debug("Getting titles")
     for db in databases():
-        show.titles.update(db.get_show_titles(show))
+        show.add_titles(db.get_show_titles(show))
 
     # get if should use absolute numbering
     _log.debug("Getting absolute numbering")
@@ -6,13 +6,15 @@ from nab import scheduler
 
 _log = log.log.getChild("download")
 _downloads = {}
+_shows = None
 
 
 class Downloader(register.Entry):
     _register = register.Register()
     _type = "downloader"
 
-    def download(self, torrent):
+    def download(self, torrent, episodes=None):
+        # only files of the given episodes need to be downloaded
         raise NotImplemented()
 
     def get_size(self, torrent):
@@ -46,33 +48,59 @@ class DownloadException(Exception):
         Exception.__init__(self, msg)
 
 
+def init(shows):
+    global _shows
+    _shows = shows
+
+
+def find_episode(id_):
+    """
+    Return the episode with the given id, for downloaders choosing files
+    after a download has started. Return None if there is no such episode.
+    """
+    if _shows is None:
+        return None
+    return _shows.find(id_)
+
+
 def _downloader():
     return Downloader.get_all(config.config["downloader"])[0]
 
 
-def download(entry, torrent):
+def download(entry, torrent, episodes=None):
+    """
+    Download the torrent for the given wanted episodes of the entry,
+    which are no longer wanted once the download has started.
+    Return whether the download was started.
+    """
     if not torrent:
-        return
+        return False
     if torrent in _downloads:
-        return
+        return False
 
     _log.info('For "%s" downloading %s' % (entry, torrent))
     _log.debug(torrent.url)
     if config.options.test:
         raise DownloadException("Nab is in test mode, no downloading allowed")
 
+    # only the wanted episodes in the torrent are downloaded
+    if episodes is None:
+        episodes = entry.epwanted
+    episodes = list(episodes)
+
     downloader = _downloader()
     try:
-        downloader.download(torrent)
+        downloader.download(torrent, episodes)
     except exception.PluginError:
-        # unsuccessful, silently continue
-        pass
-    else:
-        # successful, record downloaded file
-        _downloads[torrent] = entry
-        # mark this entry's episodes as no longer wanted
-        for episode in entry.epwanted:
-            episode.wanted = False
+        # unsuccessful, search again later
+        return False
+
+    # successful, record downloaded file
+    _downloads[torrent] = entry
+    # mark the episodes in the file as no longer wanted
+    for episode in episodes:
+        episode.wanted = False
+    return True
 
 
 def check_downloads():
@@ -84,6 +112,7 @@ def check_downloads():
                 scheduler.scheduler.add_asap("rename_file", path)
             del _downloads[d]
 scheduler.tasks["check_downloads"] = check_downloads
+scheduler.lanes["check_downloads"] = "transfer"
 
 
 def get_size(torrent):
@@ -1,14 +1,43 @@
-from nab import show_elem, match
+from nab import show_elem
 
 
 class Episode(show_elem.ShowElem):
+    # there are many episodes, so don't give each one a __dict__
+    __slots__ = ("parent", "title", "_titles", "_formatted_titles", "num",
+                 "owned", "watched", "_wanted", "_aired", "_container", "_id")
+
     def __init__(self, season, num, title, aired, titles=None):
+        self._id = None
         show_elem.ShowElem.__init__(self, season, title, titles)
         self.num = num
         self.owned = False
         self.watched = False
-        self.wanted = True
-        self.aired = aired
+        self._wanted = True
+        self._aired = aired
+        self._container = None
+
+    @property
+    def wanted(self):
+        return self._wanted
+
+    @wanted.setter
+    def wanted(self, value):
+        with show_elem._lock:
+            changed = bool(value) != bool(self._wanted)
+            self._wanted = value
+            if changed and self._container is not None:
+                self._container._wanted_changed(self)
+
+    @property
+    def aired(self):
+        return self._aired
+
+    @aired.setter
+    def aired(self, value):
+        changed = value != self._aired
+        self._aired = value
+        if changed and self._container is not None:
+            self._container._aired_changed()
 
     def __repr__(self):
         return "<Episode (%s)>" % str(self)
@@ -16,6 +45,7 @@ class Episode(show_elem.ShowElem):
     @show_elem.ShowElem.season.setter
     def season(self, value):
         self.parent = value
+        self._id = None
 
     @property
     def episode(self):
@@ -29,8 +59,7 @@ class Episode(show_elem.ShowElem):
     def absolute(self):
         if self.season.num == 0:
             return None
-        eps = [ep for ep in self.show.episodes if ep.season.num != 0]
-        return eps.index(self) + 1
+        return self.show.absolute_number(self.season.num, self.num)
 
     @property
     def previous(self):
@@ -63,7 +92,9 @@ class Episode(show_elem.ShowElem):
 
     @property
     def id(self):
-        return self.season.id + (self.num,)
+        if self._id is None:
+            self._id = self.season.id + (self.num,)
+        return self._id
 
     @property
     def epwanted(self):
@@ -72,6 +103,10 @@ class Episode(show_elem.ShowElem):
         else:
             return []
 
+    @property
+    def num_wanted(self):
+        return 1 if self.wanted else 0
+
     def has_aired(self):
         if show_elem.ShowElem.has_aired(self):
             return True
@@ -142,7 +177,7 @@ class Episode(show_elem.ShowElem):
         if self.season.num == 0:
             names.append({
                 "titles": titles,
-                "eptitles": set(map(match.format_title, self.titles))
+                "eptitles": set(self.formatted_titles)
             })
 
         return names
@@ -166,9 +201,10 @@ class Episode(show_elem.ShowElem):
     def match(self, f, total=True):
         # match by title if a special
         if self.season.num == 0:
-            titles = [" ".join([match.format_title(t), self.title])
-                      for t in self.show.titles]
-            return f.title in titles
+            # title must be a show title followed by the episode title
+            suffix = " " + self.title
+            return (f.title.endswith(suffix) and
+                    f.title[:-len(suffix)] in self.show.formatted_titles)
 
         # match by absolute number if using absolute numbering or season 1
         if ((self.show.absolute or self.season.num == 1) and f.season is None
@@ -2,13 +2,21 @@ import pprint
 import math
 import time
 import re
+import os
+import sys
+import Queue
+import threading
+import appdirs
+from multiprocessing.pool import ThreadPool
 
 from nab import register
+from nab import cache
 from nab import log
 from nab import match
 from nab import config
 from nab import downloader
 from nab import exception
+from nab.parser import FilenameParser
 from nab.scheduler import scheduler, tasks
 from nab.show import Show
 from nab.season import Season
@@ -23,14 +31,52 @@ video_exts = ['mpg', 'mpe', 'mpeg', 'mp2v', 'm2v', 'm2s', 'avi', 'mov', 'qt',
               'ogm', 'flv', 'mkv', 'ts']
 sub_exts = ['srt', 'sub', 'smi']
 
+_parser = FilenameParser(video_exts + sub_exts)
+
+
+# the same titles are returned on every search and refresh,
+# so keep parse results around instead of parsing them again
+@cache.lru_memoized(20000)
+def split_filename(filename, format_filename=True):
+    return _parser.split(filename, format_filename)
+
+
+@cache.lru_memoized(20000)
+def parse_filename(filename, format_filename=True):
+    return _parser.parse_fields(split_filename(filename, format_filename),
+                                format_filename)
+
+
+# searches that found nothing, by source and search term,
+# these are not made again until they could find something
+_no_results = cache.ExpiringSet(
+    os.path.join(appdirs.user_cache_dir('nab'), 'no_results.json'))
+
+
+# guards creating the thread pools of searchers
+_pool_lock = threading.Lock()
+
 
 class FileSource(register.Entry):
     _register = register.Register()
     _type = "file source"
 
+    # seconds to wait for a search before giving up on this source
+    timeout = 120
+
+    def __init__(self, timeout=None):
+        if timeout is not None:
+            self.timeout = timeout
+
     def find(self, show, season=None, episode=None):
         raise NotImplemented()
 
+    def find_all(self, entries):
+        """
+        Return the files found for each of the given entries, by entry id.
+        """
+        return dict((entry.id, self.find(entry)) for entry in entries)
+
 
 class FileFilter(register.Entry):
     _register = register.Register()
@@ -39,9 +85,21 @@ class FileFilter(register.Entry):
     def filter(self, f):
         raise NotImplemented()
 
+    def compile(self, weight=1.0):
+        """
+        Return (weight, filter function) pairs, summed to rank a file.
+        """
+        return [(weight, self.filter)]
+
 
 class Searcher(FileSource):
-    def __init__(self, search_by=None, match_by=None):
+    # number of search terms searched for at once
+    searches_at_once = 1
+    # threads searching for terms, kept as long as the searcher
+    _search_pool = None
+
+    def __init__(self, search_by=None, match_by=None, timeout=None):
+        FileSource.__init__(self, timeout)
         _conv = {
             "show": Show,
             "season": Season,
@@ -55,45 +113,129 @@ class Searcher(FileSource):
     def search(self, term=None):
         raise NotImplemented()
 
-    def _search_all(self, s_terms, entry):
-
-        def valid_file(f):
-            self.__class__.log.debug('Checking file %s' % f.filename)
+    def _valid_file(self, f):
+        self.__class__.log.debug('Checking file %s' % f.filename)
 
-            # title must not contain bad words!
-            badwords = ["raw", "internal"]
-            for tag in f.tags:
-                if tag in badwords:
-                    return False
-                # no tags that are just numbers (avoiding obscure files)
-                if re.match(r"\d+$", tag):
-                    return False
+        # there must be at least one seeder
+        # check this first, because it does not need the file parsed
+        if f.seeds is not None and f.seeds == 0:
+            return False
 
-            # there must be at least one seeder
-            if f.seeds is not None and f.seeds == 0:
+        # title must not contain bad words!
+        # only tags are needed, so numbering is not parsed yet
+        badwords = ["raw", "internal"]
+        for tag in f.tags:
+            if tag in badwords:
                 return False
+            # no tags that are just numbers (avoiding obscure files)
+            if re.match(r"\d+$", tag):
+                return False
+
+        return True
+
+    def _match_files(self, files, entry):
+        matches = [f for f in files if entry.match(f)]
+        if matches:
+            self.__class__.log.debug('Valid files for %s: %d'
+                                     % (entry, len(matches)))
+        return matches
 
-            match = entry.match(f)
-            if match:
-                self.__class__.log.debug('Valid file!')
-            return match
+    def _search(self, s_terms, aired=None):
+        # aired gives the latest airdate of entries searched for by a term
+        aired = aired or {}
 
-        # search under every title
-        files = []
+        terms = []
         for term in s_terms:
-            self.__class__.log.debug('Searching "%s"' % term)
-            results = self.search(term)
-            files += results
+            key = (str(self), match.format_filename(term))
+            if key in _no_results:
+                self.__class__.log.debug('Skipping "%s", no recent results'
+                                         % term)
+            else:
+                terms.append((term, key))
+
+        # search under every title, yielding files as they are found
+        found = set()
+        failed = set()
+        for term, f in self._search_each([term for term, key in terms],
+                                         failed):
+            found.add(term)
+            yield f
+
+        for term, key in terms:
+            if term in found:
+                _no_results.discard(key)
+            elif term not in failed:
+                # search again a little before the entry would be
+                _no_results.add(key, 0.9 * _search_delay(aired.get(term)))
+
+    def _search_term(self, term, failed):
+        # searches that fail are remembered, so they are not taken
+        # to have found nothing
+        self.__class__.log.debug('Searching "%s"' % term)
+        try:
+            for f in self.search(term):
+                yield f
+        except exception.PluginError:
+            failed.add(term)
+
+    def _search_each(self, terms, failed):
+        # yield (term, file) for every file found
+        if self.searches_at_once <= 1 or len(terms) <= 1:
+            for term in terms:
+                for f in self._search_term(term, failed):
+                    yield term, f
+            return
 
-        return filter(valid_file, files)
+        # searches put their files on a queue, then None when finished,
+        # or the exception raised
+        results = Queue.Queue()
 
-    def find(self, entry):
+        def search(term):
+            try:
+                for f in self._search_term(term, failed):
+                    results.put((term, f))
+            except Exception:
+                results.put((None, sys.exc_info()))
+            else:
+                results.put((None, None))
+
+        self._get_pool().map_async(search, terms)
+
+        remaining = len(terms)
+        while remaining:
+            term, f = results.get()
+            if term is not None:
+                yield term, f
+            elif f is None:
+                remaining -= 1
+            else:
+                raise f[0], f[1], f[2]
+
+    def _get_pool(self):
+        with _pool_lock:
+            if self._search_pool is None:
+                self._search_pool = ThreadPool(self.searches_at_once)
+            return self._search_pool
+
+    def _found_files(self, s_terms, aired):
+        # valid files found under any of the terms, each file only once
+        for f in _unique_files(self._search(s_terms, aired)):
+            if self._valid_file(f):
+                yield f
+
+    def _search_all(self, s_terms, entry):
+        aired = dict((term, entry.aired_max) for term in s_terms)
+        for f in self._found_files(s_terms, aired):
+            if entry.match(f):
+                yield f
+
+    def _search_terms(self, entry):
         # Only search for things this searcher supports
         for m in self.match_by:
             if isinstance(entry, m):
                 break
         else:
-            return []
+            return None
 
         # choose to search by show, season or episode
         s_terms = None
@@ -112,219 +254,117 @@ class Searcher(FileSource):
                 s_terms = entry.show.search_terms()
             except AttributeError:
                 pass
+        return s_terms
+
+    def find(self, entry):
+        s_terms = self._search_terms(entry)
         if s_terms is None:
-            return
+            return []
 
         # get results
-        return self._search_all(s_terms, entry)
+        files = list(self._search_all(s_terms, entry))
+        if files:
+            self.__class__.log.debug('Valid files for %s: %d'
+                                     % (entry, len(files)))
+        return files
+
+    def find_all(self, entries):
+        # search every distinct term of all entries once,
+        # then check every result against every entry
+        searched = []
+        s_terms = []
+        aired = {}
+        for entry in entries:
+            terms = self._search_terms(entry)
+            if terms is None:
+                continue
+            searched.append(entry)
+            for term in terms:
+                if term not in aired:
+                    s_terms.append(term)
+                    aired[term] = entry.aired_max
+                else:
+                    aired[term] = max(aired[term], entry.aired_max)
+
+        found = dict((entry.id, []) for entry in entries)
+        if searched:
+            files = list(self._found_files(s_terms, aired))
+            for entry in searched:
+                found[entry.id] = self._match_files(files, entry)
+        return found
+
+
+def _unique_files(files):
+    # the same torrent is often found under several search terms,
+    # only the first is kept, with the most seeds of any of them
+    seen = {}
+    for f in files:
+        first = seen.get(f)
+        if first is None or (first.seeds == 0 and f.seeds):
+            # a file without seeds is not valid, so give it another chance
+            seen[f] = f
+            yield f
+        elif f.seeds > first.seeds:
+            first.seeds = f.seeds
+
+
+def _split_field(name):
+    return property(lambda self: getattr(self._get_split(), name))
+
+
+def _parsed_field(name):
+    return property(lambda self: getattr(self._get_parsed(), name))
 
 
 class File(object):
+    """
+    A file identified by its filename.
+    Fields are only parsed from the filename when first accessed.
+    """
+    __slots__ = ("filename", "_format_filename", "_split", "_parsed")
 
     def __init__(self, filename, format_filename=True):
         self.filename = filename
-
-        data = File._split_filename(filename, format_filename)
-
-        self.ext = None
-        if 'ext' in data:
-            self.ext = data['ext']
-
-        self.group = None
-        if 'group' in data:
-            self.group = data['group']
-
-        self.title = data['title']
-        if format_filename:
-            self.title = match.format_title(self.title)
-
-        self.season = None
-        if 'season' in data:
-            self.season = int(data['season'])
-
-        if 'serange' in data and data['serange'] is not None:
-            self.serange = int(data['serange'])
-        else:
-            self.serange = self.season
-
-        self.episode = None
-        if 'episode' in data and data['episode'] is not None:
-            self.episode = int(data['episode'])
-
-        if 'eprange' in data and data['eprange'] is not None:
-            self.eprange = int(data['eprange'])
-        else:
-            self.eprange = self.episode
-
-        n_eps = None
-        try:
-            n_eps = self.eprange - self.episode
-        except TypeError:
-            pass
-
-        self.eptitle = None
-        # if this file contains three episodes or more,
-        # it is likely a season or batch of episodes and
-        # has no episode title
-        if 'eptitle' in data and n_eps is not None and n_eps < 3:
-            self.eptitle = data['eptitle']
-
-        self.tags = data['tags']
-
-    @staticmethod
-    def _split_filename(filename, format_filename):
-        if format_filename:
-            filename = match.format_filename(filename)
-        data = {"title": filename}
-
-        data.update(File._split_ext(data["title"]))
-
-        # check for group data at beginning or end
-        group = File._split_group_end(data["title"])
-        if not group:
-            group = File._split_group_begin(data["title"])
-        data.update(group)
-
-        data.update(File._split_tags(data["title"]))
-        data.update(File._split_numbering(data["title"]))
-
-        return data
-
-    @staticmethod
-    def _split_numbering(title):
-        mapping = {
-            'div': r'[\s-]+',
-            # we do not match episode numbers greater than 999
-            # because they usually indicate a year.
-            'eptxt': r'(ep?|(episodes?)? )',
-            'ep': r'(?P<episode>\d{1,3})(-(?P<eprange>\d{1,3}))?(v\d+)?',
-            'eprange': r'(?P<episode>\d{1,3})-(?P<eprange>\d{1,3})(v\d+)?',
-            'setxt': r'(s|seasons? )',
-            'se': r'(?P<season>\d{1,3})(-(?P<serange>\d{1,3}))?',
-            'year': r'\d{4}(-\d{4})?',
-            'title': r'(?P<title>.*?)',
-            'full': r'(full|complete)'
-        }
-
-        # Match 'Title - S01 E01 - Episode name', 'Title Season 01 Episode 01'
-        num_re = (r'{title}{div}'
-                  '{setxt}?{se} ?{eptxt}{ep}'
-                  '({div}(?P<eptitle>.*))?$'.format(**mapping))
-        match = re.match(num_re, title, re.I)
-        if match:
-            d = match.groupdict()
-            if d["eptitle"] == "":
-                del d["eptitle"]
-            return d
-
-        # Match 'Title - 01x01 - Episode name'
-        num_re = (r'{title}{div}{se}x{ep}'
-                  '({div}(?P<eptitle>.*))$'.format(**mapping))
-        match = re.match(num_re, title, re.I)
-        if match:
-            d = match.groupdict()
-            if d["eptitle"] == "":
-                del d["eptitle"]
-            return d
-
-        # Match 'Title - Season 01'
-        num_re = (r'{title}{div}'
-                  '({full} )?{setxt}{se}'
-                  '( {full})?$'.format(**mapping))
-        match = re.match(num_re, title, re.I)
-        if match:
-            return match.groupdict()
-
-        # Match 'Title - 04'
-        num_re = (r'{title}{div}{eptxt}{ep}'
-                  '({div}(?P<eptitle>.*))?$'.format(**mapping))
-        match = re.match(num_re, title, re.I)
-        if match:
-            d = match.groupdict()
-            if d["eptitle"] == "":
-                del d["eptitle"]
-            return d
-
-        # Check if this matches common 'complete series' patterns
-        # e.g. Avatar (Full 3 seasons), Breaking Bad (Complete series)
-        #      FLCL 1-6 Complete series
-        comp_re = (r'{title}{div}'            # title
-                   '\(?\s*({eprange}{div})?'  # optional episode range
-                   '{full}( ((\d+ )?(series|seasons|episodes)( {year})?)|$)'
-                   .format(**mapping))
-        match = re.match(comp_re, title, re.I)
-        if match:
-            d = match.groupdict()
-            # ignore any given episode ranges
-            del d['episode']
-            del d['eprange']
-            return d
-
-        return {}
-
-    @staticmethod
-    def _split_ext(title):
-        ext_re = r"(.*?)\s+\.?(%s)$" % '|'.join(video_exts + sub_exts)
-        match = re.match(ext_re, title, re.I)
-        if match:
-            return {"title": match.group(1), "ext": match.group(2)}
-
-        return {}
-
-    @staticmethod
-    def _split_group_begin(title):
-        group_begin_re = r"[\[\(\{](?P<group>.*?)[\]\)\}](?P<title>.*)$"
-        match = re.match(group_begin_re, title, re.I)
-        if match:
-            return match.groupdict()
-
-        return {}
-
-    @staticmethod
-    def _split_group_end(title):
-        # if this title does not contain any tags then do not treat this as a
-        # group title, this avoids issues when the title includes a hyphen
-        # e.g. Psycho-Pass
-        if not File._split_tags(title)['tags']:
-            return {}
-
-        group_end_re = (r'(?P<title>.*?)'
-                        '(-\s*(?P<group>\w+))$')
-        match = re.match(group_end_re, title, re.I)
-        if match:
-            return match.groupdict()
-
-        return {}
-
-    @staticmethod
-    def _split_tags(title):
-        tags = []
-
-        # match tags in brackets, unless it is a year, e.g. Archer (2009)
-        bracket_re = r"[\(\[\{]((?!\d{4}[\]\}\)]).*?)[\]\}\)]"
-        split_re = r"[-_\s]+"
-        match = re.findall(bracket_re, title, re.I)
-        if match:
-            title = re.sub(bracket_re, "", title, flags=re.I).strip()
-            for m in match:
-                tags += re.split(split_re, m, flags=re.I)
-
-        tag_re = (r'(.*?)\s+'
-                  '((?:bd|hdtv|proper|web-dl|x264|dd5.1|hdrip|dvdrip|xvid|'
-                  'cd[0-9]|dvdscr|brrip|divx|batch|internal|specials|'
-                  '\d{3,4}x\d{3,4}|\d{3,4}p).*?)$')
-        match = re.match(tag_re, title, re.I)
-        if match:
-            title = match.group(1).strip()
-            tags += re.split(split_re, match.group(2), flags=re.I)
-
-        return {"title": title, "tags": tags}
+        self._format_filename = format_filename
+        self._split = None
+        self._parsed = None
+
+    def _get_split(self):
+        if self._split is None:
+            self._split = split_filename(self.filename, self._format_filename)
+        return self._split
+
+    def _get_parsed(self):
+        if self._parsed is None:
+            self._parsed = parse_filename(self.filename,
+                                          self._format_filename)
+        return self._parsed
+
+    ext = _split_field("ext")
+    group = _split_field("group")
+    tags = _split_field("tags")
+    title = _parsed_field("title")
+    season = _parsed_field("season")
+    serange = _parsed_field("serange")
+    episode = _parsed_field("episode")
+    eprange = _parsed_field("eprange")
+    eptitle = _parsed_field("eptitle")
+
+    # only the filename is saved, fields are parsed again when needed
+    def __getstate__(self):
+        return {"filename": self.filename,
+                "format_filename": self._format_filename}
+
+    def __setstate__(self, state):
+        File.__init__(self, state["filename"],
+                      state.get("format_filename", True))
 
     def __str__(self):
         return self.filename
 
 
 class Torrent(File):
+    __slots__ = ("url", "magnet", "seeds")
 
     def __init__(self, filename, url=None, magnet=None, seeds=None):
         File.__init__(self, filename)
@@ -332,27 +372,56 @@ class Torrent(File):
         self.magnet = magnet
         self.seeds = seeds
 
+    def __getstate__(self):
+        return {"filename": self.filename, "url": self.url,
+                "magnet": self.magnet, "seeds": self.seeds}
+
+    def __setstate__(self, state):
+        Torrent.__init__(self, state["filename"], state.get("url"),
+                         state.get("magnet"), state.get("seeds"))
+
     def __str__(self):
         if self.seeds:
             return "%s (%d seeds)" % (self.filename, self.seeds)
         else:
             return self.filename
 
+    def _key(self):
+        # torrents without a link are told apart by their filenames
+        if self.url is None and self.magnet is None:
+            return (self.filename,)
+        return (self.url, self.magnet)
+
     def __hash__(self):
-        return hash((self.url, self.magnet))
+        return hash(self._key())
 
     def __eq__(self, other):
         try:
-            return self.url == other.url and self.magnet == other.magnet
+            return self._key() == other._key()
         except AttributeError:
             return False
 
 
-def _schedule_find(entry):
-    if entry.aired is None:
+def wanted_files(paths, episodes):
+    """
+    Return whether each path in a torrent is a file of one of the episodes.
+    Files are matched by name, or by their whole path if inside a folder
+    named after the show.
+    """
+    wanted = []
+    for path in paths:
+        names = [os.path.basename(path), " ".join(re.split(r"[\\/]", path))]
+        wanted.append(any(ep.match(File(name))
+                          for name in names for ep in episodes))
+    return wanted
+
+
+def _search_delay(aired):
+    # search less often the longer ago something aired
+    if aired is None:
         time_since_aired = time.time()
     else:
-        time_since_aired = time.time() - entry.aired
+        time_since_aired = time.time() - aired
 
     if time_since_aired > 0:
         delay = time_since_aired * math.log(time_since_aired) / 200
@@ -361,76 +430,224 @@ def _schedule_find(entry):
     else:
         delay = -time_since_aired  # nab as soon as it airs
 
-    scheduler.add(delay, "find_file", entry, True)
+    return delay
 
 
-def _rank_file(f):
-    filters = FileFilter.get_all(config.config["files"]["filters"])
-    _log.debug(f.filename)
-    rank = sum(filt.filter(f) for filt in filters)
-    _log.debug(rank)
-    return rank
+def _schedule_find(entry):
+    scheduler.add(_search_delay(entry.aired), "find_file", entry, True)
 
 
-def _best_file(files):
-    if files:
-        _log.debug("Finding best file:")
-        best = max(files, key=lambda f: _rank_file(f))
-        _log.debug("Best file found:")
-        _log.debug(best.filename)
-        return best
-    return None
+class _Ranking(object):
+    """
+    File filters compiled into one list of weighted filter functions.
+    """
 
+    def __init__(self, filters, version=None):
+        self.version = version
+        self.filters = []
+        for filt in filters:
+            self.filters += filt.compile()
 
-def _find_all_files(entry):
-    # only search for aired shows
-    if not entry.has_aired():
-        return None
+    def rank(self, f):
+        return sum(weight * filt(f) for weight, filt in self.filters)
+
+
+_ranking = None
+
+
+def _get_ranking():
+    # filters are only loaded again when the config is reloaded
+    global _ranking
+    ranking = _ranking
+    if ranking is None or ranking.version != config.version:
+        filters = FileFilter.get_all(config.config["files"]["filters"])
+        ranking = _Ranking(filters, config.version)
+        _ranking = ranking
+    return ranking
 
-    _log.info("Searching for %s" % entry)
+
+def _search_plan(entry):
+    # the entry and everything below it with wanted episodes, in the order
+    # searched, so batches covering only some wanted episodes are found too
+    plan = []
+    if entry.num_wanted:
+        plan.append(entry)
+    try:
+        for child in sorted(entry.values(),
+                            key=lambda c: c.aired, reverse=True):
+            if child.num_wanted:
+                plan += _search_plan(child)
+    except AttributeError:
+        pass
+    return plan
+
+
+# costs weighed when choosing files, as a number of torrents downloaded
+_torrent_cost = 1.0
+_redundant_cost = 0.5
+
+
+def _select_files(plan, found, ranking):
+    """
+    Choose files covering every wanted episode that a file was found for.
+    Each torrent downloaded, each episode downloaded but not wanted and each
+    rank given up for a worse file costs, and files are chosen greedily by
+    cost for each wanted episode covered.
+    Returns (entry, file, episodes covered) for each file chosen.
+    """
+    # files found, with the first entry each was found for,
+    # which is the largest as parents are planned before children
     files = []
+    entries = {}
+    covered = {}
+    for entry in plan:
+        for f in found.get(entry.id, []):
+            if f not in covered:
+                files.append(f)
+                entries[f] = entry
+                covered[f] = set()
+            covered[f].update(entry.epwanted)
+
+    ranks = dict((f, ranking.rank(f)) for f in files)
+    best = {}
+    for f in files:
+        for ep in covered[f]:
+            best[ep] = max(best.get(ep, ranks[f]), ranks[f])
+
+    cost = {}
+    for f in files:
+        size = len(entries[f].episodes)
+        if f.episode is not None and f.eprange is not None:
+            size = max(size, f.eprange - f.episode + 1)
+        size = max(size, len(covered[f]))
+        cost[f] = (_torrent_cost +
+                   _redundant_cost * (size - len(covered[f])) +
+                   sum(best[ep] - ranks[f] for ep in covered[f]))
+
+    chosen = []
+    uncovered = set(best)
+    while uncovered:
+        f = min((f for f in files if covered[f] & uncovered),
+                key=lambda f: cost[f] / len(covered[f] & uncovered))
+        chosen.append((entries[f], f, covered[f]))
+        uncovered -= covered[f]
+    return chosen
+
+
+def _find_in_source(source, entries, results):
+    source.__class__.log.debug("Searching in %s" % source)
     try:
-        for source in FileSource.get_all(config.config["files"]["sources"]):
-            source.__class__.log.debug("Searching in %s" % source)
-            files += source.find(entry)
+        found = source.find_all(entries)
     except exception.PluginError:
-        return None
+        # errors are logged, keep results from other sources
+        return
+    except Exception:
+        source.__class__.log.exception("Error searching in %s" % source)
+        return
+    results[source] = found
+
+
+def _search_sources(entries, sources):
+    # search all sources at once, using whatever results come back in time
+    start = time.time()
+    results = {}
+    threads = []
+    for source in sources:
+        thread = threading.Thread(target=_find_in_source,
+                                  args=(source, entries, results))
+        thread.daemon = True
+        thread.start()
+        threads.append((source, thread))
+
+    finished = []
+    for source, thread in threads:
+        thread.join(max(0.0, source.timeout - (time.time() - start)))
+        if thread.is_alive():
+            source.__class__.log.warning("Search timed out in %s" % source)
+        else:
+            finished.append(source)
 
-    if not files:
-        _log.info("No file found for %s" % entry)
+    # files found for each entry, by entry id
+    found = dict((entry.id, []) for entry in entries)
+    for source in finished:
+        for id_, files in results.get(source, {}).iteritems():
+            found[id_] += files
+    return found
 
-    return files
 
+def _find_all_files(entries, sources=None):
+    # only search for aired shows
+    entries = [e for e in entries if e.has_aired()]
+    if not entries:
+        return {}
 
-def find_file(entry, reschedule):
-    # get entry only if wanted
+    if len(entries) == 1:
+        _log.info("Searching for %s" % entries[0])
+    else:
+        _log.info("Searching for %s and %d more"
+                  % (entries[0], len(entries) - 1))
+
+    if sources is None:
+        sources = FileSource.get_all(config.config["files"]["sources"])
+
+    # search shows, then seasons, then episodes, skipping entries inside
+    # a mostly wanted entry that files were found for
+    found = {}
+    covered = set()
+    for depth in sorted(set(len(e.id) for e in entries)):
+        level = [e for e in entries if len(e.id) == depth and
+                 not any(e.id[:i] in covered for i in range(1, depth))]
+        if not level:
+            continue
+        found.update(_search_sources(level, sources))
+        for entry in level:
+            if not found[entry.id]:
+                _log.info("No file found for %s" % entry)
+            elif entry.wanted:
+                covered.add(entry.id)
+
+    _no_results.save()
+    return found
+
+
+def _reschedule(entry):
+    # search again for the largest wanted entries
     if entry.wanted:
-        f = _best_file(_find_all_files(entry))
-        if f:
-            try:
-                downloader.download(entry, f)
-            except downloader.DownloadException:
-                pass  # reschedule download
-            else:
-                return  # succesful, return
-
-        if reschedule:
-            _schedule_find(entry)
-            reschedule = False
+        _schedule_find(entry)
+        return
 
     try:
-        for child in sorted(entry.values(),
-                            key=lambda c: c.aired, reverse=True):
-            if len(child.epwanted):
-                scheduler.add_lazy("find_file", child, reschedule)
+        for child in entry.values():
+            if child.num_wanted:
+                _reschedule(child)
     except AttributeError:
         pass
+
+
+def find_file(entry, reschedule):
+    # search for the entry and all wanted entries below it together,
+    # so searches shared between them are only made once
+    plan = _search_plan(entry)
+    found = _find_all_files(plan)
+
+    for elem, f, episodes in _select_files(plan, found, _get_ranking()):
+        _log.debug("Best file found for %s:" % elem)
+        _log.debug(f.filename)
+        try:
+            downloader.download(elem, f, episodes)
+        except downloader.DownloadException:
+            pass  # reschedule download
+
+    if reschedule:
+        _reschedule(entry)
 tasks["find_file"] = find_file
 
 
 def find_files(shows):
     _log.info("Finding files")
+    _log.debug("Filename parse cache: %s" % parse_filename.cache.stats())
+    _log.debug("Title format cache: %s" % match.cache_stats())
 
     for sh in sorted(shows.values(), key=lambda sh: sh.aired, reverse=True):
-        if len(sh.epwanted):
+        if sh.num_wanted:
             scheduler.add_lazy("find_file", sh, True)
@@ -1,7 +1,13 @@
 import re
+import string
+import array
+import bisect
+import heapq
 import unidecode
 import difflib
 
+from nab import cache
+
 wordswap = {
     "&": "and",
     "the": ""
@@ -21,31 +27,55 @@ charswap = {
     "/": " ",
     "+": ""
 }
-charswap_p = re.compile('|'.join(map(re.escape, charswap)),
-                        re.IGNORECASE)
 
+# single characters are swapped using translation tables
+_charswap_table = string.maketrans(
+    "".join(c for c in charswap if charswap[c]),
+    "".join(charswap[c] for c in charswap if charswap[c]))
+_charswap_delete = "".join(c for c in charswap if not charswap[c])
+_charswap_unicode = dict((ord(c), unicode(charswap[c]) or None)
+                         for c in charswap)
 
-def format_filename(fname):
+_spaces_p = re.compile(' +')
+
+
+def _wordswap(m):
+    return " " + wordswap[m.group(2).lower()] + " "
+
+
+def _format_filename(fname):
     formatted = fname
     if isinstance(formatted, unicode):
         formatted = unidecode.unidecode(fname)  # remove accented characters
     # perform any replacements from conversion dictionary
-    formatted = wordswap_p.sub(
-        lambda x: " " + wordswap[x.group(2).lower()] + " ",
-        formatted)
-    formatted = charswap_p.sub(lambda x: charswap[x.group().lower()],
-                               formatted)
-    formatted = re.sub(' +', ' ', formatted)  # squash repeated spaces
+    formatted = wordswap_p.sub(_wordswap, formatted)
+    if isinstance(formatted, unicode):
+        formatted = formatted.translate(_charswap_unicode)
+    else:
+        formatted = formatted.translate(_charswap_table, _charswap_delete)
+    formatted = _spaces_p.sub(' ', formatted)  # squash repeated spaces
     formatted = formatted.lower().strip()  # title case and strip whitespace
     return formatted
 
 
+# the same titles are formatted over and over again
+@cache.lru_memoized(10000)
+def format_filename(fname):
+    return _format_filename(fname)
+
+
+@cache.lru_memoized(10000)
 def format_title(title):
-    formatted = re.sub(' -', '', title)  # remove hyphens from titles
+    formatted = title.replace(' -', '')  # remove hyphens from titles
     formatted = format_filename(formatted)
     return formatted
 
 
+def cache_stats():
+    return {"format_filename": format_filename.cache.stats(),
+            "format_title": format_title.cache.stats()}
+
+
 junk = ":-[]@~., \t"
 
 
@@ -62,5 +92,102 @@ def comp(a, b, ignore=[]):
     return difflib.SequenceMatcher(lambda c: c in junk, a, b).ratio()
 
 
-def closest_match(title, matches):
-    return max((comp(title, m), title) for m in matches)[1]
+def ngrams(title, n=3):
+    padded = " " * (n - 1) + title + " "
+    return set([padded[i:i + n] for i in xrange(len(padded) - n + 1)])
+
+
+class TrigramIndex(object):
+    """
+    Inverted index from n-grams of formatted titles to titles.
+
+    Used to quickly narrow down a large set of titles to a few that are
+    similar to a given title, before comparing them properly with comp.
+    """
+
+    # maximum number of index entries counted by a query,
+    # and number of titles then scored exactly
+    budget = 600
+    candidates = 20
+
+    def __init__(self, titles=(), n=3):
+        self.n = n
+        self._titles = []
+        self._values = []
+        self._sizes = array.array('I')
+        self._postings = {}
+        for title in titles:
+            self.add(title)
+
+    def add(self, title, value=None, formatted=None):
+        """
+        Add a title, giving formatted if the title is already formatted.
+        """
+        index = len(self._titles)
+        if formatted is None:
+            formatted = format_title(title)
+        grams = ngrams(formatted, self.n)
+        self._titles.append(title)
+        self._values.append(value)
+        self._sizes.append(len(grams))
+        for gram in grams:
+            try:
+                self._postings[gram].append(index)
+            except KeyError:
+                self._postings[gram] = array.array('I', [index])
+
+    def top_k(self, title, k=10):
+        """
+        Return up to k (score, title, value) tuples, most similar first.
+        Score is the Dice coefficient of the titles' n-gram sets.
+        """
+        grams = ngrams(format_title(title), self.n)
+        postings = sorted((self._postings[g] for g in grams
+                           if g in self._postings), key=len)
+        size = len(grams)
+        sizes = self._sizes
+
+        # find candidates in the rarest n-grams, the common n-grams
+        # shared by many titles hardly tell them apart
+        counts = {}
+        get = counts.get
+        visited = 0
+        rare = 0
+        for posting in postings:
+            if visited and visited + len(posting) > self.budget:
+                break
+            visited += len(posting)
+            rare += 1
+            for index in posting:
+                counts[index] = get(index, 0) + 1
+        common = postings[rare:]
+
+        # only the titles sharing the most rare n-grams for their size
+        # are scored exactly, looking them up in the common n-grams
+        candidates = heapq.nlargest(
+            self.candidates, [(float(count) / (size + sizes[index]), index)
+                              for index, count in counts.iteritems()])
+        scored = []
+        for share, index in candidates:
+            count = counts[index]
+            for posting in common:
+                i = bisect.bisect_left(posting, index)
+                if i < len(posting) and posting[i] == index:
+                    count += 1
+            scored.append((2.0 * count / (size + sizes[index]), index))
+        scored = heapq.nlargest(k, scored)
+
+        return [(score, self._titles[i], self._values[i])
+                for score, i in scored]
+
+    def __len__(self):
+        return len(self._titles)
+
+
+def closest_match(title, matches, k=10):
+    # narrow down candidates using an index before comparing them all
+    if isinstance(matches, TrigramIndex):
+        matches = [t for score, t, value in matches.top_k(title, k)]
+    if not matches:
+        return None
+    return max((comp(title, m), m) for m in matches)[1]
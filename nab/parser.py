@@ -0,0 +1,214 @@
+import re
+from collections import namedtuple
+
+from nab import match
+
+
+_mapping = {
+    'div': r'[\s-]+',
+    # we do not match episode numbers greater than 999
+    # because they usually indicate a year.
+    'eptxt': r'(ep?|(episodes?)? )',
+    'ep': r'(?P<episode>\d{1,3})(-(?P<eprange>\d{1,3}))?(v\d+)?',
+    'eprange': r'(?P<episode>\d{1,3})-(?P<eprange>\d{1,3})(v\d+)?',
+    'setxt': r'(s|seasons? )',
+    'se': r'(?P<season>\d{1,3})(-(?P<serange>\d{1,3}))?',
+    'year': r'\d{4}(-\d{4})?',
+    'title': r'(?P<title>.*?)',
+    'full': r'(full|complete)'
+}
+
+# numbering patterns, tried in order until one matches
+_numbering = [
+    # Match 'Title - S01 E01 - Episode name', 'Title Season 01 Episode 01'
+    (r'{title}{div}'
+     '{setxt}?{se} ?{eptxt}{ep}'
+     '({div}(?P<eptitle>.*))?$'),
+    # Match 'Title - 01x01 - Episode name'
+    (r'{title}{div}{se}x{ep}'
+     '({div}(?P<eptitle>.*))$'),
+    # Match 'Title - Season 01'
+    (r'{title}{div}'
+     '({full} )?{setxt}{se}'
+     '( {full})?$'),
+    # Match 'Title - 04'
+    (r'{title}{div}{eptxt}{ep}'
+     '({div}(?P<eptitle>.*))?$')
+]
+
+# Check if this matches common 'complete series' patterns
+# e.g. Avatar (Full 3 seasons), Breaking Bad (Complete series)
+#      FLCL 1-6 Complete series
+_complete = (r'{title}{div}'            # title
+             '\(?\s*({eprange}{div})?'  # optional episode range
+             '{full}( ((\d+ )?(series|seasons|episodes)( {year})?)|$)')
+
+# match tags in brackets, unless it is a year, e.g. Archer (2009)
+_bracket = r"[\(\[\{]((?!\d{4}[\]\}\)]).*?)[\]\}\)]"
+_split = r"[-_\s]+"
+_tag = (r'(.*?)\s+'
+        '((?:bd|hdtv|proper|web-dl|x264|dd5.1|hdrip|dvdrip|xvid|'
+        'cd[0-9]|dvdscr|brrip|divx|batch|internal|specials|'
+        '\d{3,4}x\d{3,4}|\d{3,4}p).*?)$')
+
+_group_begin = r"[\[\(\{](?P<group>.*?)[\]\)\}](?P<title>.*)$"
+_group_end = (r'(?P<title>.*?)'
+              '(-\s*(?P<group>\w+))$')
+
+
+# fields that can be found without looking at numbering
+SplitFilename = namedtuple("SplitFilename", ["ext", "group", "title", "tags"])
+
+# fully parsed and typed fields of a filename, shared between files
+ParsedFilename = namedtuple("ParsedFilename", [
+    "ext", "group", "title", "season", "serange",
+    "episode", "eprange", "eptitle", "tags"])
+
+
+class FilenameParser(object):
+    """
+    Splits filenames into title, numbering, group, tags and extension.
+
+    All patterns are compiled once when the parser is created.
+    """
+
+    def __init__(self, exts):
+        self._ext_re = re.compile(r"(.*?)\s+\.?(%s)$" % '|'.join(exts), re.I)
+        self._group_begin_re = re.compile(_group_begin, re.I)
+        self._group_end_re = re.compile(_group_end, re.I)
+        self._bracket_re = re.compile(_bracket, re.I)
+        self._split_re = re.compile(_split, re.I)
+        self._tag_re = re.compile(_tag, re.I)
+        self._numbering_res = [re.compile(p.format(**_mapping), re.I)
+                               for p in _numbering]
+        self._complete_re = re.compile(_complete.format(**_mapping), re.I)
+
+    def split(self, filename, format_filename=True):
+        if format_filename:
+            filename = match.format_filename(filename)
+        title = filename
+
+        ext = None
+        split = self.split_ext(title)
+        if split:
+            title, ext = split["title"], split["ext"]
+
+        # check for group data at beginning or end
+        # tags are found before looking for a group at the end, so keep them
+        # in case the group does not change the title
+        tags = self.split_tags(title)
+        group = self.split_group_end(title, tags)
+        if not group:
+            group = self.split_group_begin(title)
+        if group:
+            title = group["title"]
+            tags = self.split_tags(title)
+
+        return SplitFilename(ext, group.get("group"), tags["title"],
+                             tuple(tags["tags"]))
+
+    def parse_fields(self, split, format_filename=True):
+        data = self.split_numbering(split.title)
+
+        title = data.get('title', split.title)
+        if format_filename:
+            title = match.format_title(title)
+
+        season = None
+        if 'season' in data:
+            season = int(data['season'])
+
+        if data.get('serange') is not None:
+            serange = int(data['serange'])
+        else:
+            serange = season
+
+        episode = None
+        if data.get('episode') is not None:
+            episode = int(data['episode'])
+
+        if data.get('eprange') is not None:
+            eprange = int(data['eprange'])
+        else:
+            eprange = episode
+
+        n_eps = None
+        try:
+            n_eps = eprange - episode
+        except TypeError:
+            pass
+
+        eptitle = None
+        # if this file contains three episodes or more,
+        # it is likely a season or batch of episodes and
+        # has no episode title
+        if 'eptitle' in data and n_eps is not None and n_eps < 3:
+            eptitle = data['eptitle']
+
+        return ParsedFilename(split.ext, split.group, title,
+                              season, serange, episode, eprange, eptitle,
+                              split.tags)
+
+    def split_numbering(self, title):
+        for num_re in self._numbering_res:
+            m = num_re.match(title)
+            if m:
+                d = m.groupdict()
+                if d.get("eptitle", None) == "":
+                    del d["eptitle"]
+                return d
+
+        m = self._complete_re.match(title)
+        if m:
+            d = m.groupdict()
+            # ignore any given episode ranges
+            del d['episode']
+            del d['eprange']
+            return d
+
+        return {}
+
+    def split_ext(self, title):
+        m = self._ext_re.match(title)
+        if m:
+            return {"title": m.group(1), "ext": m.group(2)}
+
+        return {}
+
+    def split_group_begin(self, title):
+        m = self._group_begin_re.match(title)
+        if m:
+            return m.groupdict()
+
+        return {}
+
+    def split_group_end(self, title, tags=None):
+        # if this title does not contain any tags then do not treat this as a
+        # group title, this avoids issues when the title includes a hyphen
+        # e.g. Psycho-Pass
+        if tags is None:
+            tags = self.split_tags(title)
+        if not tags['tags']:
+            return {}
+
+        m = self._group_end_re.match(title)
+        if m:
+            return m.groupdict()
+
+        return {}
+
+    def split_tags(self, title):
+        tags = []
+
+        found = self._bracket_re.findall(title)
+        if found:
+            title = self._bracket_re.sub("", title).strip()
+            for f in found:
+                tags += self._split_re.split(f)
+
+        m = self._tag_re.match(title)
+        if m:
+            title = m.group(1).strip()
+            tags += self._split_re.split(m.group(2))
+
+        return {"title": title, "tags": tags}
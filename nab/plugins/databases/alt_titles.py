@@ -16,13 +16,13 @@ class AltTitles(Database):
     def add_data(self, sh):
         for t in map(lambda t: t.lower(), sh.titles):
             try:
-                sh.titles.update(self.shows[t]["titles"])
+                sh.add_titles(self.shows[t]["titles"])
             except KeyError:
                 pass
 
             for se in sh:
                 try:
-                    sh[se].titles.update(self.shows[t][se]["titles"])
+                    sh[se].add_titles(self.shows[t][se]["titles"])
                     sh[se].title = self.shows[t][se]["titles"][0]
                 except KeyError:
                     pass
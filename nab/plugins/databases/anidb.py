@@ -1,5 +1,6 @@
 from collections import namedtuple, defaultdict
 import requests
+import re
 import xml.etree.ElementTree as ET
 import urllib
 import gzip
@@ -14,7 +15,7 @@ import os
 
 from nab.database import Database
 from nab.season import Season
-from nab.match import format_title, comp
+from nab.match import format_title, comp, closest_match, TrigramIndex
 
 
 titles_file = os.path.join(appdirs.user_data_dir('nab'), 'anime-titles.xml.gz')
@@ -40,6 +41,8 @@ get_db()
 dbt = defaultdict(list)
 dbi = {}
 dbe = namedtuple("dbe", ["id", "title", "titles"])
+# index of formatted titles, for titles that are not quite right
+dbx = TrigramIndex()
 
 
 def load_db():
@@ -63,6 +66,9 @@ def load_db():
             for t in e.titles:
                 dbt[format_title(t)].append(e)
             dbi[e.id] = e
+    for t in dbt:
+        # keys of dbt are already formatted
+        dbx.add(t, formatted=t)
 load_db()
 
 # only request one page every three seconds
@@ -88,8 +94,23 @@ def get(*args, **kwargs):
     return r
 
 
-def entries(title):
-    return dbt[format_title(title)]
+def _numbers(title):
+    return re.findall(r"\d+", title)
+
+
+def entries(title, ratio=1.0):
+    ftitle = format_title(title)
+    if ftitle in dbt or ratio >= 1.0:
+        return dbt[ftitle]
+
+    # no exact match, look for a similar title (e.g. a typo),
+    # titles numbered differently are sequels and not the same show
+    closest = closest_match(ftitle, dbx)
+    if (closest is not None and comp(ftitle, closest) >= ratio and
+            _numbers(closest) == _numbers(ftitle)):
+        Anidb.log.debug("Using %s for %s" % (closest, title))
+        return dbt[closest]
+    return []
 
 
 def info(entry):
@@ -274,12 +295,24 @@ def pair_episodes_to_titles(show, episodes, title_set):
 
 
 class Anidb(Database):
+    """
+    Gets titles and seasons for anime from anidb.net.
+    """
+
+    def __init__(self, fuzzy_ratio=1.0):
+        """
+        Args:
+            fuzzy_ratio: How similar a title must be to an anidb title
+                         if there is no exact match (1.0 to disable,
+                         the default).
+        """
+        self.fuzzy_ratio = fuzzy_ratio
 
     def show_get(self, show):
         # add data about other titles for this show
         Anidb.log.debug("Getting data for %s" % show)
         try:
-            return entries(show.title)[0]
+            return entries(show.title, self.fuzzy_ratio)[0]
         except IndexError:
             Anidb.log.debug("Couldn't find %s" % show)
             return None
@@ -315,7 +348,7 @@ class Anidb(Database):
         except IndexError:
             Anidb.log.debug("Couldn't find %s" % sh)
             return
-        sh.titles.update(match.titles)
+        sh.add_titles(match.titles)
 
         # if on anidb, could use absolute episode numbering
         sh.absolute = True
@@ -330,7 +363,7 @@ class Anidb(Database):
                 season_sp = sh[se]
                 continue
             try:
-                sh[se].titles.update(set(season_entries[se - 1].titles))
+                sh[se].add_titles(season_entries[se - 1].titles)
             except IndexError:
                 pass
 
@@ -352,6 +385,6 @@ class Anidb(Database):
             # root out any obvious non-matches
             if similarity(sh, ep, assign[ep]) < 0.10:
                 continue
-            ep.titles.update(titles)
+            ep.add_titles(titles)
 
 Anidb.register("anidb")
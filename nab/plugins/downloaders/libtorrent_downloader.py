@@ -10,8 +10,9 @@ import urllib2
 from StringIO import StringIO
 import gzip
 
-from nab.downloader import Downloader
+from nab.downloader import Downloader, find_episode
 from nab.config import config
+from nab.files import wanted_files
 
 
 _state_str = {
@@ -55,6 +56,13 @@ class Libtorrent(Downloader):
 
         self.downloads = {}
         self.files = {}
+        # ids of episodes wanted from torrents still waiting for metadata
+        self.wanted = {}
+        # priority of each file in torrents only partly downloaded
+        self.priorities = {}
+        # torrents are added by search workers and prioritized
+        # by the watch thread
+        self._lock = threading.RLock()
         self.upload_total = {}
         self.download_total = {}
 
@@ -80,9 +88,11 @@ class Libtorrent(Downloader):
         # reload persistent data
         try:
             with file(libtorrent_file) as f:
-                data = yaml.load(f)
+                data = yaml.load(f, Loader=yaml.Loader)
                 for torrent in data['torrents']:
-                    self._add_torrent(torrent['torrent'])
+                    self._add_torrent(torrent['torrent'],
+                                      torrent.get('wanted'),
+                                      torrent.get('priorities'))
                     self.upload_total[torrent['torrent']] = torrent['up']
                     self.download_total[torrent['torrent']] = torrent['down']
 
@@ -94,8 +104,10 @@ class Libtorrent(Downloader):
 
         self.session.resume()
 
-    def download(self, torrent):
-        self._add_torrent(torrent)
+    def download(self, torrent, episodes=None):
+        if episodes:
+            episodes = [ep.id for ep in episodes]
+        self._add_torrent(torrent, episodes)
         self.save_state()
 
     def get_size(self, torrent):
@@ -124,12 +136,21 @@ class Libtorrent(Downloader):
 
     def save_state(self):
         # write new state to file
+        torrents = []
+        with self._lock:
+            for f in self.files:
+                torrent = {'torrent': f,
+                           'up': self._get_upload_total(f),
+                           'down': self._get_download_total(f)}
+                if f in self.priorities:
+                    torrent['priorities'] = self.priorities[f]
+                if f in self.wanted:
+                    # files are not chosen until metadata arrives
+                    torrent['wanted'] = [list(id_) for id_ in self.wanted[f]]
+                torrents.append(torrent)
         state = {
             'state': self.session.save_state(0x0ff),
-            'torrents': [{'torrent': f,
-                          'up': self._get_upload_total(f),
-                          'down': self._get_download_total(f)}
-                         for f, h in self.files.iteritems()]
+            'torrents': torrents
         }
         with file(libtorrent_file, 'w') as f:
             yaml.dump(state, f)
@@ -138,9 +159,13 @@ class Libtorrent(Downloader):
         return self.files[torrent].status().state in _completed_states
 
     def get_files(self, torrent):
+        # skipped files are never complete, so are left out
         handle = self.files[torrent]
         files = handle.get_torrent_info().files()
-        return [os.path.join(handle.save_path(), f.path) for f in files]
+        with self._lock:
+            priorities = self.priorities.get(torrent, [1] * len(files))
+        return [os.path.join(handle.save_path(), f.path)
+                for f, priority in zip(files, priorities) if priority]
 
     def _get_ratio(self, torrent):
         try:
@@ -157,7 +182,7 @@ class Libtorrent(Downloader):
         return (self.download_total[torrent] +
                 self.files[torrent].status().all_time_download)
 
-    def _add_torrent(self, torrent):
+    def _add_torrent(self, torrent, episodes=None, priorities=None):
         if torrent in self.files:
             # silently return if already downloading
             return
@@ -177,27 +202,77 @@ class Libtorrent(Downloader):
         else:
             # use magnet link
             ti = lt.torrent_info(torrent.magnet)
-        
-        handle = self.session.add_torrent({
-            'save_path': self.folder, 'ti': ti})
 
-        if torrent.url:
-            # delete torrent file
-            os.remove(path)
-
-        self.downloads[handle] = torrent
-        self.files[torrent] = handle
-        self.upload_total[torrent] = 0
-        self.download_total[torrent] = 0
+        with self._lock:
+            if torrent in self.files:
+                # added by another thread meanwhile
+                if torrent.url:
+                    os.remove(path)
+                return
+
+            handle = self.session.add_torrent({
+                'save_path': self.folder, 'ti': ti})
+
+            if torrent.url:
+                # delete torrent file
+                os.remove(path)
+
+            self.downloads[handle] = torrent
+            self.files[torrent] = handle
+            self.upload_total[torrent] = 0
+            self.download_total[torrent] = 0
+
+            if priorities:
+                self.priorities[torrent] = priorities
+                handle.prioritize_files(priorities)
+            elif episodes:
+                # files are chosen once the torrent's metadata is known
+                self.wanted[torrent] = [tuple(id_) for id_ in episodes]
+                self._prioritize(handle)
+
+    def _prioritize(self, handle):
+        # download only the files of wanted episodes
+        with self._lock:
+            torrent = self.downloads.get(handle)
+            if torrent not in self.wanted:
+                return
+            try:
+                files = handle.get_torrent_info().files()
+            except RuntimeError:
+                # caused if no metadata acquired
+                return
+            ids = self.wanted.pop(torrent)
+
+            # these episodes are no longer wanted anywhere else,
+            # so every file is downloaded unless all of them are found
+            paths = [f.path for f in files]
+            episodes = [find_episode(id_) for id_ in ids]
+            matched = [wanted_files(paths, [ep]) if ep is not None else []
+                       for ep in episodes]
+            missing = [id_ for id_, m in zip(ids, matched) if not any(m)]
+            if missing:
+                self.log.warning("No files for %s in %s, downloading all"
+                                 % (", ".join(" ".join(map(unicode, id_))
+                                              for id_ in missing), torrent))
+                return
+
+            priorities = [1 if any(w) else 0 for w in zip(*matched)]
+            self.priorities[torrent] = priorities
+            handle.prioritize_files(priorities)
+            self.log.debug("Downloading %d of %d files in %s"
+                           % (sum(priorities), len(priorities), torrent))
 
     def _remove_torrent(self, torrent):
-        handle = self.files[torrent]
-        # 1 == delete files
-        self.session.remove_torrent(handle, 1)
-        del self.downloads[handle]
-        del self.files[torrent]
-        del self.upload_total[torrent]
-        del self.download_total[torrent]
+        with self._lock:
+            handle = self.files[torrent]
+            # 1 == delete files
+            self.session.remove_torrent(handle, 1)
+            del self.downloads[handle]
+            del self.files[torrent]
+            del self.upload_total[torrent]
+            del self.download_total[torrent]
+            self.wanted.pop(torrent, None)
+            self.priorities.pop(torrent, None)
 
     def _watch_thread(self):
         while True:
@@ -239,6 +314,10 @@ class Libtorrent(Downloader):
                 self.log.info(p)
                 continue
 
+            if (p.what() == "metadata_received_alert"):
+                self._prioritize(p.handle)
+                continue
+
             if p.what() == "state_changed_alert":
                 self.log.debug(p)
 
@@ -24,7 +24,7 @@ class uTorrent(client.UTorrentClient, Downloader):
                                        config.accounts['utorrent']['username'],
                                        config.accounts['utorrent']['password'])
 
-    def download(self, torrent):
+    def download(self, torrent, episodes=None):
         self.addurl(torrent.url)
 
     def get_size(self, torrent):
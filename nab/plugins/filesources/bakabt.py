@@ -25,8 +25,8 @@ class Bakabt(Searcher):
                             "&multiaudio=1&bonus=1&c1=1&c2=1&reorder=1"
                             "&q=${s}" % _url)
 
-    def __init__(self):
-        Searcher.__init__(self, ["season"], ["season"])
+    def __init__(self, timeout=None):
+        Searcher.__init__(self, ["season"], ["season"], timeout=timeout)
         session.post("%s/login.php" % Bakabt._url,
                      data=config.accounts['bakabt'])
 
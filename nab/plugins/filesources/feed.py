@@ -1,20 +1,160 @@
-from filecache import filecache
-import feedparser
+from multiprocessing.pool import ThreadPool
+from itertools import izip
+from lxml import etree
 from unidecode import unidecode
+import httplib
 import urllib
+import urllib2
 import urlparse
+import threading
+import time
 import re
 
+from nab import cache
+from nab import exception
 from nab.files import Searcher, Torrent
 
 
-@filecache(60 * 60)
-def _get_feed(url):
-    feed = feedparser.parse(url)
-    if feed['entries']:
-        return feed['entries']
-    else:
-        raise IOError("No results found")
+# pages are fetched from many threads at once, so they are cached in memory
+# instead of in a filecache shelve, which is not safe to share
+_pages = cache.LRUCache(1000)
+_page_timeout = 60 * 60
+
+# one semaphore per host, limiting the connections open to it
+_hosts = {}
+_hosts_lock = threading.Lock()
+
+
+# pages after the first are fetched on threads shared by all feeds,
+# connections are limited by the semaphores of their hosts
+_page_threads = 8
+_page_pool = None
+
+
+def _get_page_pool():
+    global _page_pool
+    with _hosts_lock:
+        if _page_pool is None:
+            _page_pool = ThreadPool(_page_threads)
+        return _page_pool
+
+
+def _host(url, connections):
+    host = urlparse.urlparse(url).netloc
+    with _hosts_lock:
+        if host not in _hosts:
+            _hosts[host] = threading.BoundedSemaphore(connections)
+        return _hosts[host]
+
+
+# prefixes of namespaces, for elements not using the usual prefix
+_prefixes = {
+    "http://xmlns.ezrss.it/0.1/": "torrent"
+}
+
+
+def _tag(elem):
+    # feedparser style name of an element, prefixed by its namespace
+    qname = etree.QName(elem)
+    name = qname.localname.lower()
+    prefix = _prefixes.get(qname.namespace, elem.prefix)
+    if prefix:
+        return "%s_%s" % (prefix.lower(), name)
+    return name
+
+
+# fields kept from each item, others are never read
+_fields = {
+    "title": "title",
+    "link": "link",
+    "description": "description",
+    "summary": "description",
+    "torrent_magneturi": "torrent_magneturi",
+    "torrent_seeds": "torrent_seeds"
+}
+
+
+def _elements(elem):
+    # elements inside an item, such as the fields of an ezrss torrent
+    # element, leaving out items wrongly nested inside it
+    for child in elem:
+        if not isinstance(child.tag, basestring):
+            continue  # comments and processing instructions
+        if _tag(child) in ("item", "entry"):
+            continue
+        yield child
+        for grandchild in _elements(child):
+            yield grandchild
+
+
+def _parse_item(item):
+    f = {"links": []}
+    for child in _elements(item):
+        name = _tag(child)
+        if name == "enclosure":
+            f["links"].append({"rel": "enclosure", "type": child.get("type"),
+                               "href": child.get("url")})
+        elif name == "link" and child.get("href"):
+            # atom links
+            link = {"rel": child.get("rel", "alternate"),
+                    "type": child.get("type"), "href": child.get("href")}
+            f["links"].append(link)
+            if link["rel"] == "alternate":
+                f.setdefault("link", link["href"])
+        elif name in _fields and _fields[name] not in f:
+            f[_fields[name]] = "".join(child.itertext()).strip()
+            if name == "link":
+                f["links"].append({"rel": "alternate", "type": "text/html",
+                                   "href": f["link"]})
+    return f
+
+
+def _parse_feed(stream):
+    # yield the fields of each item as soon as it is parsed,
+    # forgetting items already parsed
+    items = etree.iterparse(stream, events=("start", "end"), recover=True,
+                            tag=("{*}item", "{*}entry"))
+
+    # items are yielded in the order they start, so an item wrongly
+    # nested inside another, by a tag never closed, comes after it
+    started = []
+    for event, item in items:
+        if event == "start":
+            started.append([item, None])
+            continue
+
+        for entry in started:
+            if entry[0] is item:
+                entry[1] = _parse_item(item)
+        while started and started[0][1] is not None:
+            yield started.pop(0)[1]
+
+        item.clear()
+        previous = item.getprevious()
+        while previous is not None and previous.tag == item.tag:
+            item.getparent().remove(previous)
+            previous = item.getprevious()
+
+
+def _get_feed(url, connections=2):
+    # items of a feed page, the page is cached once read
+    cached = _pages.get(url)
+    if cached is not None and time.time() - cached[0] < _page_timeout:
+        return cached[1]
+
+    # the page is read in full, so the connection is not held
+    # while the items are searched through
+    with _host(url, connections):
+        request = urllib2.Request(url, headers={"User-Agent": "nab"})
+        stream = urllib2.urlopen(request, timeout=60)
+        try:
+            entries = list(_parse_feed(stream))
+        finally:
+            stream.close()
+
+    if entries:
+        _pages.put(url, (time.time(), entries))
+    return entries
 
 
 def get_seeds(f):
@@ -34,72 +174,84 @@ def get_torrent_url(f):
     for link in f.get('links', []):
         if link['type'] == 'application/x-bittorrent':
             # remove query string and return
-            return link['href'][:link['href'].find('?')]
+            return link['href'].split('?', 1)[0]
     # no link found
     return None
 
 
 class Feed(Searcher):
     def __init__(self, url, name=None,
-                 search_by=None, match_by=None, num_pages=1):
-        Searcher.__init__(self, search_by, match_by)
+                 search_by=None, match_by=None, num_pages=1, connections=2,
+                 timeout=None):
+        Searcher.__init__(self, search_by, match_by, timeout)
         self.url = url
         self.name = name or url
         self.num_pages = num_pages
+        # connections to the feed's host, shared by searches and pages
+        self.connections = connections
+        self.searches_at_once = connections
 
         self.multipage = "{p}" in self.url
 
     def _get_feed(self, url):
         Feed.log.debug("Parsing feed at %s" % url)
 
-        # retry three times
-        feed = []
-        for retry in range(1):
-            try:
-                feed = _get_feed(url)
-            except IOError:
-                continue
-            else:
-                break
-
-        if feed:
+        try:
+            entries = _get_feed(url, self.connections)
+        except (IOError, httplib.HTTPException, etree.XMLSyntaxError) as e:
+            raise exception.PluginError(self, "Error reading feed: %s" % e)
+
+        if entries:
             Feed.log.debug("Feed parsed")
         else:
             Feed.log.debug("No results found")
+        return entries
 
-        return feed
+    def _get_pages(self, urls):
+        # read the first page, fetching the others meanwhile
+        rest = None
+        if len(urls) > 1:
+            rest = _get_page_pool().map_async(self._get_feed, urls[1:])
+        yield self._get_feed(urls[0])
+        if rest is not None:
+            for results in rest.get():
+                yield results
 
     def search(self, term):
-        files = []
-
         if isinstance(term, unicode):
             term = unidecode(term)
         term = urllib.quote(term)
 
-        files = []
         # only search first few pages for files
-        for page in range(1, self.num_pages + 1):
-            results = self._get_feed(self.url.format(s=term, p=page))
-
-            # remember page 1 links so we can tell if the
-            # site is giving us the same page again
-            links = set([f["link"] for f in results])
-            if page == 1:
-                p1_links = set(links)
-
-            # break when no results or results are the same as page 1
-            if not results or (page != 1 and p1_links == links):
-                break
+        if self.multipage:
+            pages = range(1, self.num_pages + 1)
+        else:
+            pages = [1]
 
-            for f in results:
-                url = get_torrent_url(f)
-                magnet = f.get("torrent_magneturi")
-                files.append(Torrent(f["title"], url, magnet, get_seeds(f)))
+        # fetch a few pages at once, pages after the last one with new
+        # results are fetched for nothing
+        p1_links = set()
+        for start in range(0, len(pages), self.connections):
+            window = pages[start:start + self.connections]
+            urls = [self.url.format(s=term, p=page) for page in window]
+            for page, results in izip(window, self._get_pages(urls)):
+                links = set()
+                for f in results:
+                    links.add(f.get("link"))
+                    # files on page 1 were already found
+                    if page == 1 or f.get("link") not in p1_links:
+                        url = get_torrent_url(f)
+                        magnet = f.get("torrent_magneturi")
+                        yield Torrent(f["title"], url, magnet, get_seeds(f))
 
-            if not self.multipage:
-                break
+                # remember page 1 links so we can tell if the
+                # site is giving us the same page again
+                if page == 1:
+                    p1_links = links
 
-        return files
+                # stop when no results or results are the same as page 1
+                if not links or (page != 1 and p1_links == links):
+                    return
 
     def __str__(self):
         return "%s: %s" % (Searcher.__str__(self), self.name)
@@ -2,27 +2,28 @@ from nab.files import FileFilter
 
 
 class KeywordFilter(FileFilter):
+    # strings that mean each keyword, keywords not given here
+    # are only meant by the keyword itself
     key_str = {}
 
     def __init__(self, *keywords):
         self.keywords = keywords
 
-        for keyword in self.keywords:
-            if keyword not in self.__class__.key_str:
-                self.__class__.key_str[keyword] = [keyword]
-
-    def filter_field(self, field):
-        keyword = "Other"
-        for k in self.__class__.key_str:
-            for kstr in self.__class__.key_str[k]:
-                if kstr.lower() in field:
-                    keyword = k
-                    break
+        # rank of every lowercase string meaning one of the keywords
+        self.ranks = {}
+        for rank, keyword in enumerate(self.keywords):
+            for kstr in self.key_str.get(keyword, [keyword]):
+                self.ranks.setdefault(kstr.lower(), rank)
 
         try:
-            rank = self.keywords.index(keyword)
+            self.other = self.keywords.index("Other")
         except ValueError:
-            rank = self.keywords.index("Other")
+            self.other = len(self.keywords)
+
+    def filter_field(self, field):
+        # the best keyword in the field counts
+        ranks = [self.ranks[k] for k in field if k in self.ranks]
+        rank = min(ranks) if ranks else self.other
         return 1.0 - float(rank) / len(self.keywords)
 
 
@@ -88,4 +89,11 @@ class Weighted(FileFilter):
 
     def filter(self, f):
         return sum(filt.filter(f) for filt in self.filters) * self.weight
+
+    def compile(self, weight=1.0):
+        # nested filters are ranked directly, with their weights combined
+        compiled = []
+        for filt in self.filters:
+            compiled += filt.compile(weight * self.weight)
+        return compiled
 Weighted.register("weighted")
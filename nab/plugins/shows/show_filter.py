@@ -1,5 +1,4 @@
 from nab.show_manager import ShowFilter
-from nab import match
 
 
 class Exclude(ShowFilter):
@@ -27,9 +26,9 @@ class Specials(ShowFilter):
             except TypeError:
                 return True
 
-            for t in ep.titles:
+            for t in ep.formatted_titles:
                 for keyword in keywords:
-                    if keyword in match.format_title(t):
+                    if keyword in t:
                         return not inverse
             return inverse
 
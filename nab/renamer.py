@@ -6,7 +6,7 @@ import string
 from nab import config
 from nab import log
 from nab import files
-from nab.scheduler import scheduler, tasks
+from nab.scheduler import scheduler, tasks, lanes
 
 pattern = config.config["renamer"]["pattern"]
 copy = config.config["renamer"].get("copy", True)
@@ -121,3 +121,4 @@ def rename_file(path):
     if is_video:
         episode.owned = True
 tasks["rename_file"] = rename_file
+lanes["rename_file"] = "transfer"
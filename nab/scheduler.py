@@ -1,9 +1,11 @@
 import time
 import threading
 import log
-import heapq
-from collections import deque
+from collections import deque, OrderedDict
 import yaml
+import json
+import glob
+import bisect
 import appdirs
 import os
 
@@ -13,16 +15,69 @@ _log = log.log.getChild("scheduler")
 # lists all valid scheduler tasks
 tasks = {}
 
+# lane each task runs in, tasks not listed here run in the search lane
+# asap tasks always run in the priority lane
+lanes = {}
+
+# tasks that change the whole show tree, so run when no other show does
+exclusive = set()
+
+# number of worker threads in each lane
+default_workers = {"search": 4, "transfer": 1, "priority": 1}
+
 _shows = None
 
 
 schedule_file = os.path.join(appdirs.user_data_dir('nab'), 'schedule.yaml')
+journal_file = os.path.join(appdirs.user_data_dir('nab'), 'schedule.journal')
+
+
+def journal_files():
+    # journal files are numbered, the schedule file says which to replay
+    found = []
+    for path in glob.glob(journal_file + ".*"):
+        try:
+            found.append((int(path.rsplit(".", 1)[1]), path))
+        except ValueError:
+            pass
+    return sorted(found)
+
+
+def _tuples(value):
+    # json gives back lists where tuples were written
+    if isinstance(value, list):
+        return tuple(map(_tuples, value))
+    return value
 
 
-def init(shows):
+def _dump_snapshot(yml, f):
+    # json is also valid yaml, one task to a line keeps it readable
+    try:
+        lines = [json.dumps(entry, sort_keys=True) for entry in yml["queue"]]
+    except (TypeError, ValueError):
+        yaml.safe_dump(yml, f)
+        return
+    f.write('{"journal": %d, "queue": [\n' % yml["journal"])
+    f.write(',\n'.join(lines))
+    f.write('\n]}\n')
+
+
+def _replace(src, dest):
+    try:
+        os.rename(src, dest)
+    except OSError:
+        # can't rename over an existing file on windows
+        os.remove(dest)
+        os.rename(src, dest)
+
+
+def init(shows, workers=None):
     global _shows
     _shows = shows
 
+    if workers:
+        scheduler.workers.update(workers)
+
     try:
         scheduler.load()
     except (IOError, ValueError):
@@ -66,6 +121,15 @@ class _SchedQueue:
     def has_next(self):
         return len(self._queue) > 0
 
+    def __len__(self):
+        return len(self._queue)
+
+    def next_delay(self):
+        # seconds until the next task is due, or None if there is none
+        if self.has_next():
+            return 0.0
+        return None
+
     def pop(self):
         if not self.has_next():
             return None
@@ -76,9 +140,14 @@ class _SchedQueue:
 
 
 class _SchedQueueTimed(_SchedQueue):
+    """
+    Binary heap of (time, action, argument) entries, with the position of
+    every task kept in an index so tasks can be found, brought forward or
+    removed without searching the whole heap.
+    """
 
     def __init__(self, name):
-        self._set = set()
+        self._index = {}
         self._queue = []
         self.name = name
 
@@ -90,26 +159,40 @@ class _SchedQueueTimed(_SchedQueue):
         return yml
 
     def push(self, dtime, action, argument):
-        if (action, argument) in self._set:
-            # if entry already present, look it up
-            match = None
-            for (d_q, act_q, arg_q) in self._queue:
-                if (act_q, arg_q) == (action, argument):
-                    match = (d_q, act_q, arg_q)
-                    break
-
-            # if match found and new time is SOONER, replace it
+        pos = self._index.get((action, argument))
+        if pos is not None:
+            # if new time is SOONER, move the entry forward
             # if new time is later, ignore
-            if match is not None and match[0] > dtime:
-                self._queue.remove(match)
-                heapq.heapify(self._queue)  # rearrange into heap
-            else:
-                return False
+            if self._queue[pos][0] > dtime:
+                self._queue[pos] = (dtime, action, argument)
+                self._sift_up(pos)
+                return True
+            return False
 
-        heapq.heappush(self._queue, (dtime, action, argument))
-        self._set.add((action, argument))
+        self._queue.append((dtime, action, argument))
+        self._index[(action, argument)] = len(self._queue) - 1
+        self._sift_up(len(self._queue) - 1)
+        return True
+
+    def remove(self, action, argument):
+        pos = self._index.pop((action, argument), None)
+        if pos is None:
+            return False
+
+        # fill the gap with the last entry and restore the heap around it
+        last = self._queue.pop()
+        if pos < len(self._queue):
+            self._queue[pos] = last
+            self._index[last[1:]] = pos
+            self._sift_down(self._sift_up(pos))
         return True
 
+    def __contains__(self, task):
+        return task in self._index
+
+    def __len__(self):
+        return len(self._queue)
+
     def has_next(self):
         if self._queue:
             # get information about next item
@@ -121,40 +204,222 @@ class _SchedQueueTimed(_SchedQueue):
 
         return False
 
+    def next_delay(self):
+        if not self._queue:
+            return None
+        return max(0.0, self._queue[0][0] - time.time())
+
     def pop(self):
-        action_time, action, argument = heapq.heappop(self._queue)
-        self._set.remove((action, argument))
+        action_time, action, argument = self._queue[0]
+        self.remove(action, argument)
         return action, argument
 
+    def _sift_up(self, pos):
+        queue, index = self._queue, self._index
+        entry = queue[pos]
+        while pos > 0:
+            parent = (pos - 1) >> 1
+            if not entry < queue[parent]:
+                break
+            queue[pos] = queue[parent]
+            index[queue[pos][1:]] = pos
+            pos = parent
+        queue[pos] = entry
+        index[entry[1:]] = pos
+        return pos
+
+    def _sift_down(self, pos):
+        queue, index = self._queue, self._index
+        size = len(queue)
+        entry = queue[pos]
+        while True:
+            child = 2 * pos + 1
+            if child >= size:
+                break
+            if child + 1 < size and queue[child + 1] < queue[child]:
+                child += 1
+            if not queue[child] < entry:
+                break
+            queue[pos] = queue[child]
+            index[queue[pos][1:]] = pos
+            pos = child
+        queue[pos] = entry
+        index[entry[1:]] = pos
+        return pos
+
+
+class _Histogram:
+    """
+    Counts of values in fixed buckets of seconds, cheap enough to record
+    every task.
+    """
+
+    bounds = [0.01, 0.1, 1.0, 10.0, 60.0, 600.0, 3600.0]
 
-class Scheduler:
+    def __init__(self):
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    @property
+    def mean(self):
+        if not self.count:
+            return 0.0
+        return self.total / self.count
+
+    def to_yaml(self):
+        labels = ["<%gs" % b for b in self.bounds] + [">%gs" % self.bounds[-1]]
+        return {"buckets": dict(zip(labels, self.counts)),
+                "mean": self.mean, "max": self.max}
+
+
+class _ActionStats:
 
     def __init__(self):
+        self.runs = 0
+        self.failures = 0
+        # from when a task was due to when it started
+        self.wait = _Histogram()
+        self.duration = _Histogram()
+
+    def to_yaml(self):
+        return {"runs": self.runs, "failures": self.failures,
+                "wait": self.wait.to_yaml(),
+                "duration": self.duration.to_yaml()}
+
+
+class _Lane:
+    """
+    Queues of tasks run by a group of worker threads.
+    """
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
         self.queue = _SchedQueueTimed('timed')
         self.queue_asap = _SchedQueue('asap')
         self.queue_lazy = _SchedQueue('lazy')
 
+    @property
+    def queues(self):
+        # in order of priority
+        return [self.queue_asap, self.queue, self.queue_lazy]
+
+
+class Scheduler:
+    """
+    Runs tasks when they are due, on worker threads.
+
+    In journal mode every change to the queues is appended to a journal.
+    When the journal grows much larger than the queues, a snapshot of the
+    queues is written to the schedule file in the background and a new
+    journal is started. Loading replays the journals after the snapshot.
+    """
+
+    # number of journal records before compacting into a snapshot
+    journal_limit = 1000
+
+    def __init__(self, workers=None, journal=True):
+        # number of worker threads for each lane
+        self.workers = dict(default_workers)
+        if workers:
+            self.workers.update(workers)
+        self._lanes = {}
+
         self._qlock = threading.Condition()
 
+        # number of running tasks for each show, tasks waiting for a show
+        self._running = {}
+        self._waiting = OrderedDict()
+        self._threads = []
+
+        # statistics for each action, when asap and lazy tasks were added
+        self._stats = {}
+        self._queued_at = {}
+
         self._last_save = 0.0
         self._save_invalidate = False
 
+        self.journal = journal
+        self._journal = None
+        self._journal_records = 0
+        self._generation = 0
+        self._snapshot_generation = 0
+        self._compacting = False
+        self._snapshot_lock = threading.Lock()
+
+        # when the timer thread will next wake the workers
+        self._timer_due = None
+
         self._stop_flag = True
 
+    def _lane(self, name):
+        try:
+            return self._lanes[name]
+        except KeyError:
+            lane = _Lane(name, max(1, self.workers.get(name, 1)))
+            self._lanes[name] = lane
+            return lane
+
+    def _queue(self, queue_name, action):
+        # asap tasks jump ahead of everything else in the priority lane
+        if queue_name == 'asap':
+            return self._lane('priority').queue_asap
+        name = lanes.get(action, 'search')
+        if name not in self.workers:
+            name = 'search'
+        lane = self._lane(name)
+        if queue_name == 'lazy':
+            return lane.queue_lazy
+        return lane.queue
+
     def to_yaml(self):
-        return {
-            "queue": (self.queue_asap.to_yaml() +
-                      self.queue_lazy.to_yaml() +
-                      self.queue.to_yaml())
-            }
+        yml = []
+        lanes = self._lanes.values()
+        for q in ([lane.queue_asap for lane in lanes] +
+                  [lane.queue_lazy for lane in lanes] +
+                  [lane.queue for lane in lanes]):
+            yml += q.to_yaml()
+        # tasks taken off the queues, but waiting for their show
+        for waiting in self._waiting.values():
+            for lane, queue, dtime, action, argument in waiting:
+                yml.append(queue._yaml_entry(dtime or queue.name,
+                                             action, argument))
+        return {"queue": yml}
 
     def load(self):
-        with file(schedule_file, 'r') as f:
-            yml = yaml.load(f)
+        # tasks by (queue, action, argument), in the order they were queued
+        entries = OrderedDict()
+        generation = 0
+
+        try:
+            with file(schedule_file, 'r') as f:
+                data = f.read()
+        except IOError:
+            if not journal_files():
+                raise
+            yml = None
+        else:
+            try:
+                # snapshots are json, which is much faster to read than yaml
+                yml = json.loads(data)
+            except ValueError:
+                yml = yaml.load(data)
             if not yml:
                 # yaml file is invalid
                 raise ValueError("Schedule file is invalid yaml")
 
+        if yml:
+            generation = yml.get("journal", 0)
             for entry in yml["queue"]:
                 dtime = entry["time"]
                 action = entry["action"]
@@ -163,68 +428,313 @@ class Scheduler:
                 # yes I did just encode the decoded argument
                 # this is to add back in tuples, which are hashable
 
-                if dtime == 'asap':
-                    self.queue_asap.push(None, action, argument)
-                elif dtime == 'lazy':
-                    self.queue_lazy.push(None, action, argument)
+                if dtime in ('asap', 'lazy'):
+                    self._replay(entries, "push", dtime, None,
+                                 action, argument)
                 else:
-                    self.queue.push(dtime, action, argument)
+                    self._replay(entries, "push", 'timed', dtime,
+                                 action, argument)
+
+        for gen, path in journal_files():
+            if gen < generation:
+                # already in the snapshot
+                continue
+            generation = gen
+            with file(path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # last record may be cut short
+                        continue
+                    if record[0] == "push":
+                        op, queue_name, dtime, action, argument = record
+                    else:
+                        op, queue_name, action, argument = record
+                        dtime = None
+                    self._replay(entries, op, queue_name, dtime,
+                                 action, _tuples(argument))
+
+        with self._qlock:
+            self._generation = generation
+            now = time.time()
+            for (queue_name, action, argument), dtime in entries.iteritems():
+                self._queue(queue_name, action).push(dtime, action, argument)
+                if dtime is None:
+                    self._queued_at[(queue_name, action, argument)] = now
+
+    def _replay(self, entries, op, queue_name, dtime, action, argument):
+        key = (queue_name, action, argument)
+        if op == "pop":
+            entries.pop(key, None)
+        elif key not in entries:
+            entries[key] = dtime
+        elif dtime is not None and dtime < entries[key]:
+            # timed tasks are only ever brought forward
+            entries[key] = dtime
+
+    def _record(self, *record):
+        if not self.journal:
+            return
+        try:
+            line = json.dumps(record, separators=(',', ':'))
+        except (TypeError, ValueError):
+            # can't go in the journal, so write everything out now
+            self._compact()
+            return
+
+        if self._journal is None:
+            self._journal = file("%s.%d" % (journal_file, self._generation),
+                                 'a')
+        self._journal.write(line + "\n")
+        self._journal.flush()
+        self._journal_records += 1
+
+    def _queued(self):
+        return (sum(len(q) for lane in self._lanes.values()
+                    for q in lane.queues) +
+                sum(len(w) for w in self._waiting.values()))
+
+    def _compact(self, background=False):
+        # start a new journal, the snapshot replaces all the older ones
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        self._generation += 1
+        self._journal_records = 0
+
+        yml = self.to_yaml()
+        yml["journal"] = self._generation
+        if background:
+            self._compacting = True
+            threading.Thread(target=self._write_snapshot,
+                             args=(yml, self._generation)).start()
+        else:
+            self._write_snapshot(yml, self._generation)
+
+    def _write_snapshot(self, yml, generation):
+        try:
+            with self._snapshot_lock:
+                # a newer snapshot may have been written in the meantime
+                if generation < self._snapshot_generation:
+                    return
+                self._snapshot_generation = generation
+
+                # write to a new file first so the schedule is never partial
+                tmp_file = schedule_file + ".tmp"
+                with file(tmp_file, 'w') as f:
+                    _dump_snapshot(yml, f)
+                _replace(tmp_file, schedule_file)
+
+                for gen, path in journal_files():
+                    if gen < generation:
+                        os.remove(path)
+        finally:
+            self._compacting = False
 
     def save(self):
-        yaml.safe_dump(self.to_yaml(), file(schedule_file, 'w'))
+        if self.journal:
+            with self._qlock:
+                self._compact()
+        else:
+            yaml.safe_dump(self.to_yaml(), file(schedule_file, 'w'))
 
     def _save_decision(self):
-        if time.time() - self._last_save > 1.0 and self._save_invalidate:
+        if self.journal:
+            # changes are already in the journal
+            self._save_invalidate = False
+            if (self._journal_records > self.journal_limit and
+                    not self._compacting and
+                    self._journal_records > 2 * self._queued()):
+                self._compact(background=True)
+        elif time.time() - self._last_save > 1.0 and self._save_invalidate:
             self.save()
             self._save_invalidate = False
             self._last_save = time.time()
 
     def start(self):
-        if self._stop_flag:
+        with self._qlock:
+            if not self._stop_flag or self._threads:
+                return
             _log.debug("Starting")
             self._stop_flag = False
-            threading.Thread(target=self._run).start()
+            for name in self.workers:
+                # lanes may have been made before workers were configured
+                lane = self._lane(name)
+                lane.workers = max(1, self.workers[name])
+                for i in range(lane.workers):
+                    thread = threading.Thread(target=self._run, args=(lane,),
+                                              name="nab-%s-%d" % (name, i))
+                    self._threads.append(thread)
+                    thread.start()
 
     def stop(self):
         _log.debug("Setting stop flag")
-        self._stop_flag = True
+        with self._qlock:
+            self._stop_flag = True
+            self._qlock.notify_all()
+
+    def join(self):
+        # wait for running tasks to finish after stopping
+        for thread in list(self._threads):
+            thread.join()
+
+    def _task_key(self, action, argument):
+        # tasks that change the whole show tree run on their own
+        if action in exclusive:
+            return "*"
+        # tasks on the same show run one at a time
+        for arg in argument:
+            if isinstance(arg, tuple) and arg and arg[0] == "show_entry":
+                return arg[1][0]
+        return None
 
-    def _wait_next(self):
-        while not self._stop_flag:
-            # acquire queue lock
-            with self._qlock:
-                # check all queues in order of priority
-                for q in [self.queue_asap, self.queue, self.queue_lazy]:
-                    if q.has_next():
-                        return q.pop()
+    def _busy(self, key):
+        if key == "*":
+            return bool(self._running)
+        # tasks without a show can read the show tree, so also wait for
+        # exclusive tasks, and don't let them keep exclusive tasks waiting
+        if "*" in self._running or "*" in self._waiting:
+            return True
+        return key is not None and key in self._running
+
+    def _is_waiting(self, action, argument):
+        waiting = self._waiting.get(self._task_key(action, argument), ())
+        return any(task[3] == action and task[4] == argument
+                   for task in waiting)
+
+    def _next_delay(self, lane):
+        # time to sleep before a queued task is due
+        delays = [q.next_delay() for q in lane.queues]
+        # wake up to save any changes that could not be saved yet
+        if self._save_invalidate:
+            delays.append(max(0.0, self._last_save + 1.0 - time.time()))
+        delays = [d for d in delays if d is not None]
+        if delays:
+            return min(delays)
+        return None
 
-            # test once every second
-            time.sleep(1.0)
-            self._save_decision()
+    def _next_task(self, lane):
+        # tasks that were waiting for their show come first
+        for key, waiting in self._waiting.items():
+            if waiting[0][0] is lane and not self._busy(key):
+                task = waiting.popleft()
+                if not waiting:
+                    del self._waiting[key]
+                return key, task[1].name, task[2], task[3], task[4]
+
+        # check all queues in order of priority
+        for q in lane.queues:
+            while q.has_next():
+                dtime = q._queue[0][0] if q is lane.queue else None
+                action, argument = q.pop()
+                key = self._task_key(action, argument)
+                if not self._busy(key):
+                    return key, q.name, dtime, action, argument
+                self._waiting.setdefault(key, deque()).append(
+                    (lane, q, dtime, action, argument))
 
         return None
 
-    def _run(self):
+    def _wait_next(self, lane):
+        with self._qlock:
+            while not self._stop_flag:
+                task = self._next_task(lane)
+                if task is not None:
+                    key, queue_name, dtime, action, argument = task
+                    self._record("pop", queue_name, action, argument)
+                    self._running[key] = self._running.get(key, 0) + 1
+
+                    # untimed tasks are due as soon as they are added
+                    now = time.time()
+                    due = self._queued_at.pop(
+                        (queue_name, action, argument), dtime)
+                    if due is not None:
+                        self._action_stats(action).wait.add(
+                            max(0.0, now - due))
+                    return key, action, argument
+
+                # sleep until a task is due or a new task is added
+                delay = self._next_delay(lane)
+                if delay is not None:
+                    self._wake_at(time.time() + delay)
+                self._qlock.wait()
+                self._save_decision()
+
+        return None
+
+    def _wake_at(self, due):
+        # a timed wait on a condition polls, so instead a thread sleeps
+        # until the next task is due and wakes the workers
+        if self._timer_due is not None and self._timer_due <= due:
+            return
+        self._timer_due = due
+        thread = threading.Thread(target=self._timer, args=(due,),
+                                  name="nab-timer")
+        thread.daemon = True
+        thread.start()
+
+    def _timer(self, due):
+        time.sleep(max(0.0, due - time.time()))
+        with self._qlock:
+            # a sooner timer may have replaced this one
+            if self._timer_due == due:
+                self._timer_due = None
+                self._qlock.notify_all()
+
+    def _action_stats(self, action):
+        try:
+            return self._stats[action]
+        except KeyError:
+            stats = self._stats[action] = _ActionStats()
+            return stats
+
+    def _done(self, key, action, duration, failed):
+        with self._qlock:
+            stats = self._action_stats(action)
+            stats.runs += 1
+            stats.duration.add(duration)
+            if failed:
+                stats.failures += 1
+
+            self._running[key] -= 1
+            if not self._running[key]:
+                del self._running[key]
+            self._save_invalidate = True
+            self._save_decision()
+            # other workers may be waiting for this show
+            self._qlock.notify_all()
+
+    def _run(self, lane):
         while not self._stop_flag:
-            task = self._wait_next()
+            task = self._wait_next(lane)
 
             # stop flag has been set, so waiting has stopped
             if task is None:
                 continue
 
-            action, argument = task
+            key, action, argument = task
 
             _log.debug("Executing scheduled task %s%s"
                        % (action, tuple(argument)))
 
-            tasks[action](*self._decode_argument(argument))
-            self._save_invalidate = True
-            self._save_decision()
-
-        # save state when stopping scheduler
-        self.save()
-
-        _log.debug("Stopping")
+            start = time.time()
+            failed = True
+            try:
+                tasks[action](*self._decode_argument(argument))
+                failed = False
+            except Exception:
+                _log.exception("Error in scheduled task %s%s"
+                               % (action, tuple(argument)))
+            finally:
+                self._done(key, action, time.time() - start, failed)
+
+        # save state when the last worker stops
+        with self._qlock:
+            self._threads.remove(threading.current_thread())
+            if not self._threads:
+                self.save()
+                _log.debug("Stopping")
 
     def _encode_argument(self, argument):
         new_arguments = []
@@ -254,7 +764,7 @@ class Scheduler:
             new_arguments.append(arg)
         return tuple(new_arguments)
 
-    def _add(self, queue, delay, action, argument):
+    def _add(self, queue_name, delay, action, argument):
         argument = self._encode_argument(argument)
 
         if delay is None:
@@ -265,21 +775,86 @@ class Scheduler:
             tstr = " at %s" % time.ctime(dtime)
 
         with self._qlock:
-            if queue.push(dtime, action, argument):
+            queue = self._queue(queue_name, action)
+            if self._is_waiting(action, argument):
+                # already due, waiting for its show
+                pass
+            elif queue.push(dtime, action, argument):
+                self._record("push", queue.name, dtime, action, argument)
+                if dtime is None:
+                    self._queued_at[(queue.name, action, argument)] = \
+                        time.time()
                 _log.debug("Scheduling %s%s on %s%s"
                            % (action, tuple(argument), queue.name, tstr))
                 self._save_invalidate = True
                 self._save_decision()
-            self._qlock.notify()
+            self._qlock.notify_all()
 
     def add(self, delay, action, *argument):
-        self._add(self.queue, delay, action, argument)
+        self._add('timed', delay, action, argument)
 
     def add_asap(self, action, *argument):
-        self._add(self.queue_asap, None, action, argument)
+        self._add('asap', None, action, argument)
 
     def add_lazy(self, action, *argument):
-        self._add(self.queue_lazy, None, action, argument)
+        self._add('lazy', None, action, argument)
+
+    def stats(self):
+        """
+        Return the number of queued tasks by queue and action, and
+        statistics about the tasks that have run, by action.
+        """
+        with self._qlock:
+            depths = {}
+            for lane in self._lanes.values():
+                for q in lane.queues:
+                    depth = depths.setdefault(q.name, {})
+                    for entry in q._queue:
+                        action = entry[-2]
+                        depth[action] = depth.get(action, 0) + 1
+            waiting = {}
+            for entries in self._waiting.values():
+                for entry in entries:
+                    waiting[entry[3]] = waiting.get(entry[3], 0) + 1
+            depths["waiting"] = waiting
+
+            return {
+                "queues": depths,
+                "running": sum(self._running.values()),
+                "actions": dict((action, stats.to_yaml())
+                                for action, stats in self._stats.items())
+            }
+
+    def log_stats(self):
+        stats = self.stats()
+        _log.info("Queued: %s, running: %d" % (
+            ", ".join("%s %d" % (name, sum(depth.values()))
+                      for name, depth in sorted(stats["queues"].items())),
+            stats["running"]))
+        for action, s in sorted(stats["actions"].items()):
+            _log.info("%s: %d runs, %d failed, "
+                      "mean wait %.1fs (max %.1fs), "
+                      "mean duration %.1fs (max %.1fs)"
+                      % (action, s["runs"], s["failures"],
+                         s["wait"]["mean"], s["wait"]["max"],
+                         s["duration"]["mean"], s["duration"]["max"]))
+
+    def cancel(self, action, *argument):
+        argument = self._encode_argument(argument)
+        with self._qlock:
+            if self._queue('timed', action).remove(action, argument):
+                self._record("pop", "timed", action, argument)
+                _log.debug("Cancelled %s%s" % (action, tuple(argument)))
+                self._save_invalidate = True
+                self._qlock.notify_all()
 
 
 scheduler = Scheduler()
+
+
+def log_stats():
+    # summarise scheduler statistics every ten minutes
+    scheduler.add(10 * 60, "log_stats")
+    scheduler.log_stats()
+tasks["log_stats"] = log_stats
+lanes["log_stats"] = "priority"
@@ -1,8 +1,9 @@
-from nab import show_elem, match, episode
+from nab import show_elem, episode
 
 
 class Season(show_elem.ShowParentElem, show_elem.ShowElem):
     def __init__(self, show, num, title=None, titles=None):
+        self._id = None
         show_elem.ShowParentElem.__init__(self)
         show_elem.ShowElem.__init__(self, show, title, titles)
         self.num = num
@@ -13,7 +14,9 @@ class Season(show_elem.ShowParentElem, show_elem.ShowElem):
 
     @property
     def id(self):
-        return self.show.id + (self.num,)
+        if self._id is None:
+            self._id = self.show.id + (self.num,)
+        return self._id
 
     def merge(self, season):
         show_elem.ShowParentElem.merge(self, season)
@@ -48,7 +51,7 @@ class Season(show_elem.ShowParentElem, show_elem.ShowElem):
 
         if self.titles:
             # season has a title
-            titles = set(map(match.format_title, self.titles))
+            titles = set(self.formatted_titles)
             names[-1]["titles"].update(titles)
             names.append({"titles": titles})
 
@@ -67,11 +70,10 @@ class Season(show_elem.ShowParentElem, show_elem.ShowElem):
                 else:
                     terms.append(t)
         # if absolute numbered, add episode range as search term
-        if self.show.absolute:
+        absrange = self.show.absolute_range(self.num)
+        if self.show.absolute and absrange is not None:
             for t in self.show.titles:
-                terms.append("%s %d-%d" % (t,
-                                           self.episodes[0].absolute,
-                                           self.episodes[-1].absolute))
+                terms.append("%s %d-%d" % ((t,) + absrange))
         return terms
 
     def match(self, f, total=True):
@@ -80,22 +82,18 @@ class Season(show_elem.ShowParentElem, show_elem.ShowElem):
             # if using absolute numbering, see if this file matches
             # this season's absolute episode numbers
             # must match against SHOW not season in this case
-            try:
-                start = self.episodes[0].absolute
-            except IndexError:
-                pass  # there are no episodes in this season
-            else:
-                if (self.show.absolute and self.show.match(f, False) and
-                   f.episode == start and f.eprange == start + len(self) - 1):
-                    return True
+            absrange = self.show.absolute_range(self.num)
+            # there may be no episodes in this season
+            if (absrange is not None and self.show.absolute and
+               self.show.match(f, False) and
+               (f.episode, f.eprange) == absrange):
+                return True
 
             # ...or episode range must match episodes in season
             if f.episode != 1 or f.eprange != len(self):
                 return False
 
-        titles = map(match.format_title, self.titles)
-
-        return ((f.title in titles and f.season is None) or
+        return ((f.title in self.formatted_titles and f.season is None) or
                 (self.show.match(f, False) and
                  f.season == self.num and f.serange == self.num))
 
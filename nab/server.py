@@ -6,6 +6,7 @@ import copy
 from nab import config
 from nab import downloader
 from nab import log
+from nab import scheduler
 
 app = Flask('nab')
 init_holster(app)
@@ -126,6 +127,11 @@ def downloads():
     return download_data
 
 
+@app.holster('/scheduler', methods=['GET'])
+def scheduler_stats():
+    return scheduler.scheduler.stats()
+
+
 @app.holster('/show/<path:path>', methods=['GET'])
 def show(path):
     search = path.split('/')
@@ -5,6 +5,8 @@ from nab import show_elem, match, database, season
 class Show(show_elem.ShowParentElem, show_elem.ShowElem):
     def __init__(self, title, ids=None, absolute=False, titles=None,
                  banner=None):
+        self._numbering = None
+        self._id = None
         show_elem.ShowParentElem.__init__(self)
         show_elem.ShowElem.__init__(self, None, title, titles)
         self.ids = ids or {}
@@ -18,9 +20,60 @@ class Show(show_elem.ShowParentElem, show_elem.ShowElem):
     def show(self):
         return self
 
+    def _changed(self):
+        self._numbering = None
+        show_elem.ShowParentElem._changed(self)
+
+    def _absolute_numbering(self):
+        # absolute numbers of episodes and seasons, ignoring specials,
+        # worked out again only when seasons or episodes are added
+        if self._numbering is None:
+            numbers = {}
+            ranges = {}
+            for senum in sorted(self):
+                if senum == 0:
+                    continue
+                season = self[senum]
+                for epnum in sorted(season):
+                    numbers[(senum, epnum)] = len(numbers) + 1
+                if len(season):
+                    ranges[senum] = (len(numbers) - len(season) + 1,
+                                     len(numbers))
+            self._numbering = (numbers, ranges)
+        return self._numbering
+
+    def absolute_number(self, senum, epnum):
+        return self._absolute_numbering()[0].get((senum, epnum))
+
+    def absolute_range(self, senum):
+        """
+        Return the first and last absolute episode numbers of a season,
+        or None if the season has no numbered episodes.
+        """
+        return self._absolute_numbering()[1].get(senum)
+
+    @property
+    def absolute_count(self):
+        return len(self._absolute_numbering()[0])
+
+    @property
+    def title(self):
+        return self._title
+
+    @title.setter
+    def title(self, value):
+        self._title = value
+        if self._id is not None:
+            # ids of the whole show depend on the title
+            self._clear_id()
+            if self._container is not None:
+                self._container._changed()
+
     @property
     def id(self):
-        return (re.sub(r'\W+', '', self.title),)
+        if self._id is None:
+            self._id = (re.sub(r'\W+', '', self.title),)
+        return self._id
 
     def format(self):
         # for all titles, remove bracketed year info
@@ -31,18 +84,17 @@ class Show(show_elem.ShowParentElem, show_elem.ShowElem):
             if yearmatch:
                 newtitles.add("%s %s" % yearmatch.group(1, 2))
                 newtitles.add("%s" % yearmatch.group(1))
-        self.titles.update(newtitles)
+        self.add_titles(newtitles)
 
         show_elem.ShowParentElem.format(self)
 
         # remove any titles that conflict with season titles past season 1
+        conflicts = set()
         for se in self:
-            if se == 1:
-                continue
-            for t in set(self.titles):
-                ft = match.format_title(t)
-                if ft in map(match.format_title, self[se].titles):
-                    self.titles.remove(t)
+            if se != 1:
+                conflicts.update(self[se].formatted_titles)
+        self.remove_titles([t for t in self.titles
+                            if match.format_title(t) in conflicts])
 
     def merge(self, other):
         show_elem.ShowParentElem.__merge__(self, other)
@@ -71,7 +123,7 @@ class Show(show_elem.ShowParentElem, show_elem.ShowElem):
         return show
 
     def search_terms(self):
-        return set(map(match.format_title, self.titles))
+        return set(self.formatted_titles)
 
     def match(self, f, total=True):
         if total:
@@ -86,7 +138,7 @@ class Show(show_elem.ShowParentElem, show_elem.ShowElem):
 
             # there must be no episode number
             # or the file must give the full range of episodes
-            epmax = len([ep for ep in self.episodes if ep.season.num != 0])
+            epmax = self.absolute_count
             if (f.episode is not None and
                (not self.absolute or f.episode != 1 or f.eprange != epmax)):
                 return False
@@ -96,8 +148,7 @@ class Show(show_elem.ShowParentElem, show_elem.ShowElem):
             if f.season is not None and (f.season != 1 or f.serange != semax):
                 return False
 
-        titles = map(match.format_title, self.titles)
-        return match.format_title(f.title) in titles
+        return match.format_title(f.title) in self.formatted_titles
 
     def __eq__(self, other):
         return show_elem.ShowElem.__eq__(self, other)
@@ -1,16 +1,72 @@
 from itertools import chain
 import time
+import threading
+import weakref
+
+from nab import match
+
+
+# titles are shared between elements wherever possible,
+# most episodes have only one title and many elements have none
+_titles_pool = weakref.WeakValueDictionary()
+_no_titles = frozenset()
+
+# cached aggregates are updated by search workers on different shows,
+# which share containers further up the tree
+_lock = threading.RLock()
+
+
+def intern_title(title):
+    # interned strings are dropped once no element uses them,
+    # unicode titles cannot be interned and are only shared in title sets
+    if isinstance(title, str):
+        return intern(title)
+    return title
+
+
+def _shared_titles(titles):
+    if not titles:
+        return _no_titles
+    return _titles_pool.setdefault(titles, titles)
 
 
 class ShowElem(object):
+    # slots are left empty so shows and seasons can also inherit from dict,
+    # episodes declare slots for these attributes themselves
+    __slots__ = ()
+
     def __init__(self, parent, title, titles):
         self.parent = parent
-        self.title = title
-        self.titles = set()
+        self.title = intern_title(title)
+        self._titles = _no_titles
+        self._formatted_titles = _no_titles
         if titles:
-            self.titles.update(titles)
+            self.add_titles(titles)
         if self.title:
-            self.titles.add(self.title)
+            self.add_titles([self.title])
+
+    @property
+    def titles(self):
+        return self._titles
+
+    @property
+    def formatted_titles(self):
+        # formatted when first needed after the titles change
+        if self._formatted_titles is None:
+            self._formatted_titles = frozenset(
+                map(match.format_title, self._titles))
+        return self._formatted_titles
+
+    def add_titles(self, titles):
+        self._set_titles(self._titles.union(map(intern_title, titles)))
+
+    def remove_titles(self, titles):
+        self._set_titles(self._titles.difference(titles))
+
+    def _set_titles(self, titles):
+        if titles != self._titles:
+            self._titles = _shared_titles(titles)
+            self._formatted_titles = None
 
     @property
     def show(self):
@@ -33,11 +89,15 @@ class ShowElem(object):
     def merge(self, other):
         if self.title is None:
             self.title = other.title
-        self.titles.update(other.titles)
+        self.add_titles(other.titles)
 
     def format(self):
         pass
 
+    def _clear_id(self):
+        # ids are cached, so must be cleared if the title or parent changes
+        self._id = None
+
     def __eq__(self, other):
         try:
             return self.id == other.id
@@ -49,9 +109,71 @@ class ShowElem(object):
 
 
 class ShowParentElem(dict):
+    """
+    An element containing seasons or episodes.
+
+    Episode lists and aggregates over them are cached. Children report
+    changes up the chain of containers, which either update the cached
+    values or throw them away to be worked out again when next needed.
+    """
 
     def __init__(self):
         dict.__init__(self)
+        self._container = None
+        self._invalidate()
+
+    def __setitem__(self, key, value):
+        self._attach(key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        self[key]._container = None
+        dict.__delitem__(self, key)
+        self._changed()
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).iteritems():
+            self._attach(key, value)
+        self._changed()
+
+    def _attach(self, key, value):
+        # replaced children must no longer report changes to this element
+        old = self.get(key)
+        if old is not None and old is not value:
+            old._container = None
+        dict.__setitem__(self, key, value)
+        value._container = self
+
+    def _invalidate(self):
+        self._episodes = None
+        self._wanted_set = None
+        self._airdates = None
+        self._counts = None
+
+    def _changed(self):
+        # children have been added or removed
+        with _lock:
+            self._invalidate()
+            if self._container is not None:
+                self._container._changed()
+
+    def _aired_changed(self):
+        self._airdates = None
+        if self._container is not None:
+            self._container._aired_changed()
+
+    def _wanted_changed(self, episode):
+        with _lock:
+            if self._wanted_set is not None:
+                if episode.wanted:
+                    self._wanted_set.add(episode)
+                else:
+                    self._wanted_set.discard(episode)
+            if self._counts is not None and episode.season.num != 0:
+                eps, wanted = self._counts
+                self._counts = (eps, wanted + (1 if episode.wanted else -1))
+            if self._container is not None:
+                self._container._wanted_changed(episode)
 
     def merge(self, other):
         for key in other:
@@ -62,40 +184,74 @@ class ShowParentElem(dict):
 
     @property
     def epwanted(self):
+        if not self.wanted_set:
+            return []
         return [ep for ep in self.episodes if ep.wanted]
 
+    @property
+    def wanted_set(self):
+        if self._wanted_set is None:
+            with _lock:
+                if self._wanted_set is None:
+                    self._wanted_set = set(ep for ep in self.episodes
+                                           if ep.wanted)
+        return self._wanted_set
+
+    @property
+    def num_wanted(self):
+        return len(self.wanted_set)
+
+    def _get_airdates(self):
+        if self._airdates is None:
+            airdates = [child.aired for child in self.itervalues()
+                        if child.aired is not None]
+            airdates_max = [child.aired_max for child in self.itervalues()
+                            if child.aired_max is not None]
+            self._airdates = (min(airdates) if airdates else None,
+                              max(airdates_max) if airdates_max else None)
+        return self._airdates
+
     @property
     def aired(self):
-        airdates = [ep.aired for ep in self.episodes if ep.aired is not None]
-        if len(airdates):
-            return min(airdates)
-        else:
-            return None
+        return self._get_airdates()[0]
 
     @property
     def aired_max(self):
-        airdates = [ep.aired for ep in self.episodes if ep.aired is not None]
-        if len(airdates):
-            return max(airdates)
-        else:
-            return None
+        return self._get_airdates()[1]
+
+    def _get_counts(self):
+        # number of episodes and wanted episodes, not counting specials
+        counts = self._counts
+        if counts is None:
+            with _lock:
+                eps = [e for e in self.episodes if e.season.num != 0]
+                counts = self._counts = (len(eps),
+                                         len([e for e in eps if e.wanted]))
+        return counts
 
     @property
     def wanted(self):
-        eps = [e for e in self.episodes if e.season.num != 0]
-        wanted = [e for e in self.epwanted if e.season.num != 0]
-        if len(eps) == 0:
+        eps, wanted = self._get_counts()
+        if eps == 0:
             return False
-        return float(len(wanted)) / float(len(eps)) > 0.75
+        return float(wanted) / float(eps) > 0.75
 
     @property
     def episodes(self):
-        return list(chain(*[self[child].episodes for child in sorted(self)]))
+        if self._episodes is None:
+            self._episodes = list(chain(*[self[child].episodes
+                                          for child in sorted(self)]))
+        return self._episodes
 
     def format(self):
         for child in self.itervalues():
             child.format()
 
+    def _clear_id(self):
+        self._id = None
+        for child in self.itervalues():
+            child._clear_id()
+
     def to_yaml(self):
         return dict([(k, v.to_yaml()) for k, v in self.iteritems()])
 
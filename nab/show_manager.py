@@ -73,8 +73,15 @@ class ShowSource(register.Entry):
 
 
 class ShowTree(show_elem.ShowParentElem):
+    """
+    All shows being followed.
+
+    Elements are looked up by id through an index, which is built when
+    first needed and again after shows, seasons or episodes are added.
+    """
 
     def __init__(self):
+        self._index = None
         show_elem.ShowParentElem.__init__(self)
         try:
             with file(shows_file, 'r') as f:
@@ -82,14 +89,31 @@ class ShowTree(show_elem.ShowParentElem):
         except IOError:
             pass  # no shows.yaml file, doesn't matter!
 
+    def _changed(self):
+        self._index = None
+        show_elem.ShowParentElem._changed(self)
+
+    def _build_index(self):
+        # if ids clash, keep the element a search of the tree finds first
+        index = {}
+        for sh in self.itervalues():
+            index.setdefault(sh.id, sh)
+            for se in sh.itervalues():
+                index.setdefault(se.id, se)
+                for ep in se.itervalues():
+                    index.setdefault(ep.id, ep)
+        return index
+
     def find(self, id_):
-        if isinstance(id_, str):
+        if isinstance(id_, basestring):
             id_ = (id_,)
 
-        for child in self.itervalues():
-            f = child.find(id_)
-            if f is not None:
-                return f
+        if self._index is None:
+            self._index = self._build_index()
+        try:
+            return self._index.get(tuple(id_))
+        except TypeError:
+            return None
 
     def save(self):
         yaml.safe_dump(self.to_yaml(), file(shows_file, 'w'))
@@ -186,6 +210,6 @@ def filter_shows(shows):
     # filter using show filters and strict filtering (must meet all criteria)
     filter_all(ShowFilter.get_all(config.config["shows"]["filters"]), False)
 
-    _log.info("Found %s needed episode(s)" % len(shows.epwanted))
+    _log.info("Found %s needed episode(s)" % shows.num_wanted)
     for ep in shows.epwanted:
         _log.info(ep)
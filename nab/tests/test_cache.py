@@ -0,0 +1,75 @@
+import unittest
+import os
+import shutil
+import tempfile
+from nab.cache import LRUCache, lru_memoized, ExpiringSet
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+        self.assertEquals(len(cache), 2)
+
+    def test_stats(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        self.assertEquals(cache.get('a'), 1)
+        self.assertEquals(cache.get('b'), None)
+        self.assertEquals(cache.stats(),
+                          {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 2})
+
+    def test_memoized(self):
+        calls = []
+
+        @lru_memoized(10)
+        def double(x):
+            calls.append(x)
+            return x * 2
+
+        self.assertEquals(double(2), 4)
+        self.assertEquals(double(2), 4)
+        self.assertEquals(calls, [2])
+        self.assertEquals(double.cache.hits, 1)
+
+
+class TestExpiringSet(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'set.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_expiry(self):
+        keys = ExpiringSet()
+        keys.add(('a', 'b'), 60)
+        keys.add(('c', 'd'), -1)
+        self.assertIn(('a', 'b'), keys)
+        self.assertNotIn(('c', 'd'), keys)
+        self.assertEquals(len(keys), 1)
+
+        keys.discard(('a', 'b'))
+        self.assertNotIn(('a', 'b'), keys)
+
+    def test_save(self):
+        keys = ExpiringSet(self.path)
+        keys.add(('a', 'b'), 60)
+        keys.add(('c', 'd'), -1)
+        keys.save()
+
+        loaded = ExpiringSet(self.path)
+        self.assertIn(('a', 'b'), loaded)
+        self.assertEquals(len(loaded), 1)
+
+if __name__ == '__main__':
+    unittest.main()
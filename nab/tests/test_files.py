@@ -106,7 +106,6 @@ class TestFile(unittest.TestCase):
         for filename, data in file_tests:
             f = File(filename)
             print filename
-            print f.__dict__
 
             for name, value in data.iteritems():
                 if name == 'tags':
@@ -114,7 +113,7 @@ class TestFile(unittest.TestCase):
                     # extra tags are acceptable and unavoidable
                     for tag in value:
                         print "Asserting %s in tags" % tag
-                        self.assertIn(tag, f.__dict__[name])
+                        self.assertIn(tag, getattr(f, name))
                 elif name == 'entry':
                     # lookup the details for this show
                     # and find out if it's a match
@@ -132,7 +131,7 @@ class TestFile(unittest.TestCase):
 
                 else:
                     print "Asserting %s = %s" % (name, value)
-                    self.assertEquals(f.__dict__[name], value)
+                    self.assertEquals(getattr(f, name), value)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,210 @@
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+import types
+from nab import downloader
+from nab.files import Torrent
+from nab.show import Show
+from nab.season import Season
+from nab.episode import Episode
+
+
+class _Handle(object):
+    # a torrent whose metadata arrives when told
+
+    def __init__(self, paths):
+        self.paths = paths
+        self.metadata = False
+        self.priorities = None
+
+    def get_torrent_info(self):
+        if not self.metadata:
+            raise RuntimeError("no metadata")
+        return _Info(self.paths)
+
+    def prioritize_files(self, priorities):
+        self.priorities = priorities
+
+    def save_path(self):
+        return "downloads"
+
+    def status(self):
+        return _Status()
+
+
+class _Status(object):
+    all_time_upload = 0
+    all_time_download = 0
+    is_finished = False
+    error = ''
+
+
+class _Info(object):
+
+    def __init__(self, paths):
+        self.paths = paths
+
+    def files(self):
+        return [_File(path) for path in self.paths]
+
+
+class _File(object):
+
+    def __init__(self, path):
+        self.path = path
+
+
+class _Session(object):
+    # adds torrents with the files given for their magnets
+
+    paths = {}
+
+    def __init__(self):
+        self.handles = []
+
+    def add_torrent(self, params):
+        handle = _Handle(_Session.paths[params['ti']])
+        self.handles.append(handle)
+        return handle
+
+    def save_state(self, flags):
+        return {}
+
+    def pop_alert(self):
+        return None
+
+    def __getattr__(self, name):
+        # ignore all settings
+        return lambda *args: None
+
+
+class _Enum(object):
+
+    def __getattr__(self, name):
+        return name
+
+
+def _libtorrent():
+    lt = types.ModuleType("libtorrent")
+    lt.torrent_status = types.ModuleType("torrent_status")
+    lt.torrent_status.states = _Enum()
+    lt.alert = types.ModuleType("alert")
+    lt.alert.category_t = types.ModuleType("category_t")
+    lt.alert.category_t.error_notification = 1
+    lt.alert.category_t.status_notification = 2
+    lt.session = _Session
+    lt.session_settings = lambda: types.ModuleType("settings")
+    lt.torrent_info = lambda magnet: magnet
+    return lt
+
+# libtorrent is only needed to import the downloader, which uses the stub
+_lt = _libtorrent()
+sys.modules.setdefault("libtorrent", _lt)
+from nab.plugins.downloaders import libtorrent_downloader
+from nab.plugins.downloaders.libtorrent_downloader import Libtorrent
+
+
+class _Show(Show):
+    # don't look up show data in any databases
+    def update_data(self):
+        pass
+
+
+def _show():
+    show = _Show("Show")
+    season = Season(show, 1)
+    for epnum in [1, 2]:
+        season[epnum] = Episode(season, epnum, "Title", 10.0 + epnum)
+    show[1] = season
+    return show
+
+
+class TestLibtorrent(unittest.TestCase):
+
+    paths = ["Show S01/Show.S01E01.mkv", "Show S01/Show.S01E02.mkv",
+             "Show S01/Show.S01.nfo"]
+
+    def setUp(self):
+        self.show = _show()
+        downloader.init(self.show)
+        self.addCleanup(downloader.init, None)
+
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        self._file = libtorrent_downloader.libtorrent_file
+        libtorrent_downloader.libtorrent_file = os.path.join(
+            folder, "libtorrent.yaml")
+        self.addCleanup(setattr, libtorrent_downloader, "libtorrent_file",
+                        self._file)
+
+        self.addCleanup(setattr, libtorrent_downloader, "lt",
+                        libtorrent_downloader.lt)
+        libtorrent_downloader.lt = _lt
+
+        # don't watch downloads, which saves to the real file later on
+        watch = Libtorrent.__dict__["_watch_thread"]
+        Libtorrent._watch_thread = lambda self: None
+        self.addCleanup(setattr, Libtorrent, "_watch_thread", watch)
+
+        _Session.paths = {"magnet:s01": self.paths}
+        self.torrent = Torrent("Show S01", magnet="magnet:s01")
+
+    def _client(self):
+        # a new client, as if nab restarted
+        Libtorrent._instance = None
+        self.addCleanup(setattr, Libtorrent, "_instance", None)
+        return Libtorrent()
+
+    def _metadata(self, client):
+        handle = client.files[self.torrent]
+        handle.metadata = True
+        client._prioritize(handle)
+        return handle
+
+    def test_files_chosen(self):
+        client = self._client()
+        client.download(self.torrent, [self.show[1][2]])
+        handle = client.files[self.torrent]
+        self.assertEquals(handle.priorities, None)
+
+        self._metadata(client)
+        self.assertEquals(handle.priorities, [0, 1, 0])
+        self.assertEquals(client.get_files(self.torrent),
+                          [os.path.join("downloads", self.paths[1])])
+
+    def test_all_without_episode_files(self):
+        _Session.paths["magnet:s01"] = ["Show S01/Show.S01E01.mkv",
+                                        "Show S01/Show.S01.nfo"]
+        client = self._client()
+        client.download(self.torrent, [self.show[1][1], self.show[1][2]])
+
+        handle = self._metadata(client)
+        self.assertEquals(handle.priorities, None)
+        self.assertEquals(len(client.get_files(self.torrent)), 2)
+
+    def test_wanted_saved(self):
+        # episodes are still chosen when metadata arrives after a restart
+        client = self._client()
+        client.download(self.torrent, [self.show[1][1]])
+        client.save_state()
+
+        client = self._client()
+        self.assertEquals(self._metadata(client).priorities, [1, 0, 0])
+
+    def test_priorities_saved(self):
+        client = self._client()
+        client.download(self.torrent, [self.show[1][1]])
+        self._metadata(client)
+        client.save_state()
+
+        client = self._client()
+        handle = client.files[self.torrent]
+        self.assertEquals(handle.priorities, [1, 0, 0])
+        handle.metadata = True
+        self.assertEquals(client.get_files(self.torrent),
+                          [os.path.join("downloads", self.paths[0])])
+
+if __name__ == '__main__':
+    unittest.main()
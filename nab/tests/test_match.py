@@ -0,0 +1,99 @@
+import unittest
+import random
+from nab import match
+
+
+# syllables of romanized japanese, which anidb titles are mostly made of,
+# so titles share many common n-grams
+_syllables = ["a", "i", "u", "e", "o", "ka", "ki", "ku", "ke", "ko", "sa",
+              "shi", "su", "se", "so", "ta", "chi", "tsu", "te", "to", "na",
+              "ni", "nu", "ne", "no", "ha", "hi", "fu", "he", "ho", "ma",
+              "mi", "mu", "me", "mo", "ya", "yu", "yo", "ra", "ri", "ru",
+              "re", "ro", "wa", "n", "ga", "gi", "gu", "ge", "go", "za",
+              "ji", "zu", "ze", "zo", "da", "de", "do", "ba", "bi", "bu",
+              "be", "bo", "kyo", "shou", "ryuu", "jou", "chou"]
+_particles = ["no", "to", "wa", "ga", "ni", "de"]
+_suffixes = ["", "", "", " Season 2", " 2nd Season", " OVA", " Movie",
+             " Specials", " Zoku", " Shin"]
+
+
+def _anime_titles(count, rand):
+    def word():
+        return "".join(rand.choice(_syllables)
+                       for i in range(rand.randint(2, 4))).capitalize()
+
+    titles = set()
+    while len(titles) < count:
+        words = [word() for i in range(rand.randint(1, 4))]
+        if len(words) > 2:
+            words.insert(rand.randint(1, len(words) - 1),
+                         rand.choice(_particles))
+        titles.add(" ".join(words) + rand.choice(_suffixes))
+    return sorted(titles)
+
+
+def _typo(title, rand):
+    i = rand.randrange(len(title))
+    return rand.choice([title[:i] + title[i + 1:],
+                        title[:i] + rand.choice("aeiou") + title[i:],
+                        title[:i] + title[i + 1:i + 2] + title[i:i + 1] +
+                        title[i + 2:]])
+
+
+class TestTrigramIndex(unittest.TestCase):
+
+    titles = ['Shingeki no Kyojin', 'Sword Art Online', 'Steins;Gate',
+              'Mushishi', 'Monogatari Series Second Season', 'Bakemonogatari']
+
+    def test_top_k(self):
+        index = match.TrigramIndex(self.titles)
+        results = index.top_k('Shingeki no Kyoujin', 2)
+        self.assertEquals(len(results), 2)
+        self.assertEquals(results[0][1], 'Shingeki no Kyojin')
+        self.assertGreater(results[0][0], results[1][0])
+
+    def test_values(self):
+        index = match.TrigramIndex()
+        for i, t in enumerate(self.titles):
+            index.add(t, i)
+        score, title, value = index.top_k('Mushi-shi', 1)[0]
+        self.assertEquals((title, value), ('Mushishi', 3))
+
+    def test_closest_match(self):
+        index = match.TrigramIndex(self.titles)
+        self.assertEquals(match.closest_match('Sword Art Onilne', index),
+                          'Sword Art Online')
+        self.assertEquals(match.closest_match('Bakemonogatri', self.titles),
+                          'Bakemonogatari')
+
+    def test_recall(self):
+        # only a bounded part of the index is looked at, so a best match
+        # sharing only common n-grams can be missed, but seldom is
+        rand = random.Random(0)
+        titles = _anime_titles(10000, rand)
+        index = match.TrigramIndex(titles)
+        grams = [match.ngrams(match.format_title(t)) for t in titles]
+
+        found = 0
+        for i in range(100):
+            query = _typo(rand.choice(titles), rand)
+            qgrams = match.ngrams(match.format_title(query))
+            best = max(2.0 * len(qgrams & g) / (len(qgrams) + len(g))
+                       for g in grams)
+            results = index.top_k(query)
+            self.assertEquals(results, sorted(results, reverse=True))
+            if abs(results[0][0] - best) < 1e-9:
+                found += 1
+        self.assertGreaterEqual(found, 95)
+
+    def test_closest_recall(self):
+        rand = random.Random(1)
+        titles = _anime_titles(1000, rand)
+        index = match.TrigramIndex(titles)
+        for i in range(10):
+            query = _typo(rand.choice(titles), rand)
+            self.assertEquals(match.closest_match(query, index),
+                              match.closest_match(query, titles))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,314 @@
+import unittest
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from nab import scheduler
+
+
+class _TempFiles(unittest.TestCase):
+
+    def setUp(self):
+        # never touch the real schedule files
+        self._files = scheduler.schedule_file, scheduler.journal_file
+        self.dir = tempfile.mkdtemp()
+        scheduler.schedule_file = os.path.join(self.dir, 'schedule.yaml')
+        scheduler.journal_file = os.path.join(self.dir, 'schedule.journal')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        scheduler.schedule_file, scheduler.journal_file = self._files
+
+
+class TestScheduler(_TempFiles):
+
+    def setUp(self):
+        _TempFiles.setUp(self)
+
+        self.done = threading.Event()
+        self.times = []
+
+        def record(*args):
+            self.times.append(time.time())
+            self.done.set()
+
+        scheduler.tasks["test_record"] = record
+        self.sched = scheduler.Scheduler()
+        self.sched.start()
+
+    def tearDown(self):
+        self.sched.stop()
+        self.sched.join()
+        del scheduler.tasks["test_record"]
+        _TempFiles.tearDown(self)
+
+    def test_asap_latency(self):
+        # let the scheduler go to sleep with nothing queued
+        time.sleep(0.2)
+
+        start = time.time()
+        self.sched.add_asap("test_record")
+        self.assertTrue(self.done.wait(1.0))
+        self.assertLess(self.times[0] - start, 0.1)
+
+    def test_timed_wakeup(self):
+        start = time.time()
+        self.sched.add(0.3, "test_record")
+        self.assertTrue(self.done.wait(2.0))
+        self.assertGreaterEqual(self.times[0] - start, 0.3)
+        self.assertLess(self.times[0] - start, 0.4)
+
+    def test_stats(self):
+        def fail():
+            raise ValueError()
+        scheduler.tasks["test_fail"] = fail
+
+        self.sched.add(60, "test_record", "later")
+        self.sched.add_asap("test_record")
+        self.assertTrue(self.done.wait(1.0))
+        self.sched.add_asap("test_fail")
+        time.sleep(0.1)
+        del scheduler.tasks["test_fail"]
+
+        stats = self.sched.stats()
+        self.assertEquals(stats["queues"]["timed"], {"test_record": 1})
+        record = stats["actions"]["test_record"]
+        self.assertEquals(record["runs"], 1)
+        self.assertEquals(record["failures"], 0)
+        self.assertLess(record["wait"]["max"], 0.1)
+        self.assertEquals(stats["actions"]["test_fail"]["failures"], 1)
+
+    def test_idle_blocks(self):
+        # timed waits on a condition poll, count how often they would
+        sleeps = []
+        _sleep = threading._sleep
+
+        def counted(seconds):
+            sleeps.append(seconds)
+            _sleep(seconds)
+
+        threading._sleep = counted
+        try:
+            self.sched.add(60 * 60, "test_record", "later")
+            time.sleep(1.0)
+        finally:
+            threading._sleep = _sleep
+        self.assertLess(len(sleeps), 5)
+        self.assertFalse(self.done.is_set())
+
+    def test_sooner_task_wakes(self):
+        # a task added while sleeping for a later one runs on time
+        self.sched.add(60, "test_record", "later")
+        time.sleep(0.2)
+
+        start = time.time()
+        self.sched.add(0.1, "test_record", "sooner")
+        self.assertTrue(self.done.wait(1.0))
+        self.assertLess(self.times[0] - start, 0.2)
+
+
+class _Entry(object):
+    # stands in for a show tree element
+    def __init__(self, *id_):
+        self.id = id_
+
+
+class _Shows(object):
+    def find(self, id_):
+        return _Entry(*id_)
+
+
+class TestWorkers(_TempFiles):
+
+    def setUp(self):
+        _TempFiles.setUp(self)
+        scheduler._shows = _Shows()
+
+        self.runs = []
+        self.lock = threading.Lock()
+
+        def record(entry):
+            start = time.time()
+            time.sleep(0.2)
+            with self.lock:
+                self.runs.append((entry.id, start, time.time()))
+
+        scheduler.tasks["test_slow"] = record
+        scheduler.exclusive.add("test_exclusive")
+        scheduler.tasks["test_exclusive"] = record
+
+        def no_show(name):
+            record(_Entry(name))
+        scheduler.tasks["test_no_show"] = no_show
+        self.sched = scheduler.Scheduler({"search": 4})
+
+    def tearDown(self):
+        self.sched.stop()
+        self.sched.join()
+        del scheduler.tasks["test_slow"]
+        del scheduler.tasks["test_exclusive"]
+        del scheduler.tasks["test_no_show"]
+        scheduler.exclusive.discard("test_exclusive")
+        scheduler._shows = None
+        _TempFiles.tearDown(self)
+
+    def _run_all(self, count):
+        self.sched.start()
+        deadline = time.time() + 5.0
+        while len(self.runs) < count and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEquals(len(self.runs), count)
+
+    def _overlap(self, a, b):
+        return a[1] < b[2] and b[1] < a[2]
+
+    def test_shows_in_parallel(self):
+        for title in ["A", "B", "C"]:
+            self.sched.add_lazy("test_slow", _Entry(title))
+        start = time.time()
+        self._run_all(3)
+        self.assertLess(time.time() - start, 0.5)
+
+    def test_same_show_serialized(self):
+        self.sched.add_lazy("test_slow", _Entry("A", 1))
+        self.sched.add_lazy("test_slow", _Entry("A", 2))
+        self.sched.add_lazy("test_slow", _Entry("B"))
+        self._run_all(3)
+
+        runs = dict((r[0], r) for r in self.runs)
+        self.assertFalse(self._overlap(runs[("A", 1)], runs[("A", 2)]))
+        self.assertTrue(self._overlap(runs[("A", 1)], runs[("B",)]))
+
+    def test_exclusive(self):
+        self.sched.add_lazy("test_slow", _Entry("A"))
+        self.sched.add_lazy("test_exclusive", _Entry("X"))
+        self.sched.add_lazy("test_slow", _Entry("B"))
+        self._run_all(3)
+
+        runs = dict((r[0], r) for r in self.runs)
+        self.assertFalse(self._overlap(runs[("X",)], runs[("A",)]))
+        self.assertFalse(self._overlap(runs[("X",)], runs[("B",)]))
+
+    def test_exclusive_without_show(self):
+        # tasks without a show can still read the show tree
+        scheduler.lanes["test_no_show"] = "transfer"
+        try:
+            self.sched.add_lazy("test_exclusive", _Entry("X"))
+            self.sched.add_lazy("test_no_show", "N")
+            self._run_all(2)
+        finally:
+            del scheduler.lanes["test_no_show"]
+
+        runs = dict((r[0], r) for r in self.runs)
+        self.assertFalse(self._overlap(runs[("X",)], runs[("N",)]))
+
+    def test_waiting_not_duplicated(self):
+        self.sched.add_lazy("test_slow", _Entry("A", 1))
+        self.sched.add_lazy("test_slow", _Entry("A", 2))
+        self.sched.start()
+        time.sleep(0.1)
+        # the second task is waiting for the first, so is not added again
+        self.sched.add_lazy("test_slow", _Entry("A", 2))
+        self.assertEquals(self.sched.stats()["queues"]["waiting"],
+                          {"test_slow": 1})
+        self.assertEquals(self.sched.stats()["queues"]["lazy"], {})
+        self._run_all(2)
+
+    def test_workers_configured_late(self):
+        # a lane made before workers are configured still uses them
+        self.sched.add_lazy("test_slow", _Entry("A"))
+        self.sched.workers["search"] = 1
+        for title in ["B", "C"]:
+            self.sched.add_lazy("test_slow", _Entry(title))
+        self._run_all(3)
+        runs = sorted(self.runs, key=lambda r: r[1])
+        self.assertFalse(self._overlap(runs[0], runs[1]))
+        self.assertFalse(self._overlap(runs[1], runs[2]))
+
+
+class TestJournal(_TempFiles):
+
+    def _queue(self, sched):
+        return sorted((e["time"], e["action"], e["argument"])
+                      for e in sched.to_yaml()["queue"])
+
+    def _reload(self):
+        sched = scheduler.Scheduler()
+        sched.load()
+        return sched
+
+    def test_replay(self):
+        sched = scheduler.Scheduler()
+        sched.add(60, "a", "x", ("y", 1))
+        sched.add(30, "a", "x", ("y", 1))
+        sched.add(90, "b")
+        sched.add_asap("c", u"\xe9")
+        sched.add_lazy("d", 2)
+        sched.cancel("b")
+
+        self.assertFalse(os.path.exists(scheduler.schedule_file))
+        loaded = self._reload()
+        self.assertEquals(self._queue(loaded), self._queue(sched))
+        self.assertEquals(len(self._queue(loaded)), 3)
+
+    def test_compact(self):
+        sched = scheduler.Scheduler()
+        sched.journal_limit = 10
+        for i in range(50):
+            sched.add(i, "a", i)
+            sched.cancel("a", i - 1)
+        sched.save()
+
+        self.assertEquals(len(scheduler.journal_files()), 0)
+        sched.add_lazy("b")
+        self.assertEquals(len(scheduler.journal_files()), 1)
+
+        loaded = self._reload()
+        self.assertEquals(self._queue(loaded), self._queue(sched))
+        self.assertEquals(len(self._queue(loaded)), 2)
+
+    def test_old_schedule_file(self):
+        sched = scheduler.Scheduler(journal=False)
+        sched.add(60, "a", "x")
+        sched.add_lazy("b")
+        sched.save()
+        self.assertEquals(self._queue(self._reload()), self._queue(sched))
+
+
+class TestSchedQueueTimed(unittest.TestCase):
+
+    def test_sooner_replaces_later(self):
+        q = scheduler._SchedQueueTimed('timed')
+        self.assertTrue(q.push(20, "a", ()))
+        self.assertTrue(q.push(30, "b", ()))
+        self.assertFalse(q.push(40, "a", ()))
+        self.assertTrue(q.push(10, "b", ()))
+        self.assertEquals(len(q), 2)
+        self.assertEquals(q.pop(), ("b", ()))
+        self.assertEquals(q.pop(), ("a", ()))
+
+    def test_matches_sorted_order(self):
+        rand = random.Random(0)
+        q = scheduler._SchedQueueTimed('timed')
+        expected = {}
+        for i in range(2000):
+            task = ("task", (rand.randint(0, 300),))
+            if rand.random() < 0.2:
+                self.assertEquals(q.remove(*task), task in expected)
+                expected.pop(task, None)
+            else:
+                dtime = rand.randint(0, 1000)
+                q.push(dtime, *task)
+                expected[task] = min(dtime, expected.get(task, dtime))
+
+        order = sorted((d, a, arg) for (a, arg), d in expected.items())
+        popped = []
+        while len(q):
+            popped.append(q.pop())
+        self.assertEquals(popped, [(a, arg) for d, a, arg in order])
+        self.assertNotIn(order[0][1:], q)
+
+if __name__ == '__main__':
+    unittest.main()
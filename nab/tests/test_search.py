@@ -0,0 +1,705 @@
+import unittest
+import StringIO
+import os
+import shutil
+import tempfile
+import threading
+import time
+from nab import cache
+from nab import downloader
+from nab import exception
+from nab import files
+from nab.files import FileSource, Searcher, Torrent
+from nab.show import Show
+from nab.season import Season
+from nab.episode import Episode
+from nab.plugins.filesources import feed
+from nab.plugins.filesources import file_filter
+from nab.plugins.filesources.feed import Feed, _page_threads
+
+
+class _Show(Show):
+    # don't look up show data in any databases
+    def update_data(self):
+        pass
+
+
+class _Searcher(Searcher):
+    # returns the same results for every search, counting searches
+
+    def __init__(self, results, search_by=None):
+        Searcher.__init__(self, search_by)
+        self.results = [Torrent(r, url=r) for r in results]
+        self.terms = []
+
+    def search(self, term=None):
+        self.terms.append(term)
+        return self.results
+_Searcher.register("test_searcher")
+
+
+class _OtherSearcher(_Searcher):
+    pass
+_OtherSearcher.register("test_other_searcher")
+
+
+class _FailingSearcher(_Searcher):
+    # fails every search, after searching
+    def search(self, term=None):
+        _Searcher.search(self, term)
+        raise exception.PluginError(self, "Search failed")
+_FailingSearcher.register("test_failing_searcher")
+
+
+class _SlowSource(FileSource):
+    # finds one file for every entry, once the given function returns
+    def __init__(self, filename, wait=None, timeout=0.3):
+        FileSource.__init__(self, timeout)
+        self.filename = filename
+        self.wait = wait
+
+    def find(self, entry):
+        if self.wait is not None and self.wait() is False:
+            return []
+        return [Torrent(self.filename, url=self.filename)]
+_SlowSource.register("test_slow_source")
+
+
+class _Downloader(downloader.Downloader):
+    # records downloads, or fails them
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.downloads = []
+
+    def download(self, torrent, episodes=None):
+        if self.fail:
+            raise exception.PluginError(self, "Download failed")
+        self.downloads.append((torrent, episodes))
+_Downloader.register("test_downloader")
+
+
+class _Feed(Feed):
+    # serves numbered pages, repeating page 1 after the last page
+    def __init__(self, pages, num_pages, connections=2):
+        Feed.__init__(self, "http://feed/{s}/{p}", num_pages=num_pages,
+                      connections=connections)
+        self.pages = pages
+        self.fetched = []
+        self.threads = set()
+        self.open = 0
+        self.most_open = 0
+        self.lock = threading.Lock()
+
+    def _get_feed(self, url):
+        page = int(url.rsplit("/", 1)[1])
+        with self.lock:
+            self.fetched.append(page)
+            self.threads.add(threading.current_thread())
+            self.open += 1
+            self.most_open = max(self.most_open, self.open)
+        time.sleep(0.05)
+        with self.lock:
+            self.open -= 1
+        if page > self.pages:
+            page = 1
+        return [{"title": "Show %d-%d" % (page, i),
+                 "link": "%d-%d" % (page, i)} for i in range(2)]
+_Feed.register("test_feed")
+
+
+def _rss(*links):
+    items = "".join("<item><title>Show %s</title><link>%s</link></item>"
+                    % (link, link) for link in links)
+    return "<rss><channel>%s</channel></rss>" % items
+
+
+class _Pages(object):
+    # serves feed pages in place of urllib2.urlopen, counting connections
+    def __init__(self, pages):
+        self.pages = pages
+        self.opened = []
+        self.open = 0
+        self.most_open = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, request, timeout=None):
+        url = request.get_full_url()
+        with self.lock:
+            self.opened.append(url)
+            self.open += 1
+            self.most_open = max(self.most_open, self.open)
+        time.sleep(0.02)
+        with self.lock:
+            self.open -= 1
+        return StringIO.StringIO(self.pages.get(url, _rss()))
+
+
+def _show():
+    show = _Show("Show")
+    for senum in [1, 2]:
+        season = Season(show, senum)
+        for epnum in [1, 2]:
+            season[epnum] = Episode(season, epnum, "Title",
+                                     10.0 * senum + epnum)
+        show[senum] = season
+    return show
+
+
+class TestSearchPlan(unittest.TestCase):
+
+    def setUp(self):
+        self.show = _show()
+        # remember searches without results in memory only
+        self._no_results = files._no_results
+        files._no_results = cache.ExpiringSet()
+
+    def tearDown(self):
+        files._no_results = self._no_results
+
+    def test_plan(self):
+        self.assertEquals(files._search_plan(self.show)[:2],
+                          [self.show, self.show[2]])
+
+        # season 1 has nothing wanted left
+        self.show[1][1].wanted = False
+        self.show[1][2].wanted = False
+        self.assertEquals(files._search_plan(self.show),
+                          [self.show, self.show[2],
+                           self.show[2][2], self.show[2][1]])
+
+        # part of season 2 is still searched for as a whole
+        self.show[2][2].wanted = False
+        self.assertEquals(files._search_plan(self.show[2]),
+                          [self.show[2], self.show[2][1]])
+
+    def test_terms_searched_once(self):
+        searcher = _Searcher([], ["show"])
+        searcher.find_all(files._search_plan(self.show))
+        self.assertEquals(searcher.terms, ["show"])
+
+        searcher = _Searcher([])
+        searcher.find_all(files._search_plan(self.show))
+        self.assertEquals(len(searcher.terms), len(set(searcher.terms)))
+
+    def test_results_assigned(self):
+        searcher = _Searcher(["Show S02 [720p]", "Show S01E02 [720p]",
+                              "Show S01E02 [RAW 720p]"], ["show"])
+        found = searcher.find_all(files._search_plan(self.show))
+
+        def filenames(entry):
+            return [f.filename for f in found[entry.id]]
+
+        self.assertEquals(filenames(self.show), [])
+        self.assertEquals(filenames(self.show[2]), ["Show S02 [720p]"])
+        self.assertEquals(filenames(self.show[1][2]), ["Show S01E02 [720p]"])
+        self.assertEquals(filenames(self.show[1][1]), [])
+
+    def test_no_results_skipped(self):
+        searcher = _Searcher([])
+        searcher.find(self.show[2][1])
+        terms = list(searcher.terms)
+        self.assertTrue(terms)
+
+        searcher.terms = []
+        searcher.find(self.show[2][1])
+        self.assertEquals(searcher.terms, [])
+
+        # results are kept per source, and found results are searched again
+        other = _OtherSearcher(["Show S02E01 [720p]"])
+        self.assertTrue(other.find(self.show[2][1]))
+        self.assertTrue(other.find(self.show[2][1]))
+        self.assertEquals(other.terms, terms + terms)
+
+    def test_failed_searched_again(self):
+        searcher = _FailingSearcher([])
+        self.assertEquals(searcher.find(self.show[2][1]), [])
+        terms = list(searcher.terms)
+        self.assertTrue(terms)
+
+        # failed searches are not taken to have found nothing
+        searcher.find(self.show[2][1])
+        self.assertEquals(searcher.terms, terms + terms)
+
+    def test_no_results_saved_once(self):
+        path = os.path.join(tempfile.mkdtemp(), "no_results.json")
+        files._no_results = cache.ExpiringSet(path)
+        try:
+            _Searcher([]).find(self.show[2][1])
+            self.assertFalse(os.path.exists(path))
+
+            files._find_all_files([self.show[2][1]], [_Searcher([])])
+            self.assertTrue(os.path.exists(path))
+        finally:
+            shutil.rmtree(os.path.dirname(path))
+
+
+class _TermSearcher(Searcher):
+    # returns different results for every search term
+    def __init__(self, results):
+        Searcher.__init__(self, ["episode"])
+        self.results = results
+
+    def search(self, term):
+        return [Torrent(*r) for r in self.results.pop(0)]
+_TermSearcher.register("test_term_searcher")
+
+
+class TestUniqueFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.show = _show()
+        self._no_results = files._no_results
+        files._no_results = cache.ExpiringSet()
+
+    def tearDown(self):
+        files._no_results = self._no_results
+
+    def test_best_seeds(self):
+        episode = self.show[1][2]
+        terms = len(episode.search_terms())
+        self.assertGreater(terms, 1)
+        results = [[("Show S01E02", "a", None, 2)] for i in range(terms)]
+        results[1] = [("Show - 1x02", "a", None, 5),
+                      ("Show S01E02 v2", "b", None, 1)]
+        found = _TermSearcher(results).find(episode)
+        self.assertEquals([(f.filename, f.seeds) for f in found],
+                          [("Show S01E02", 5), ("Show S01E02 v2", 1)])
+
+    def test_without_links(self):
+        # files with neither a url nor a magnet are not all the same
+        found = list(files._unique_files([
+            Torrent("[HorribleSubs] Show - 02 [720p].mkv", seeds=5),
+            Torrent("[Commie] Show - 01 [A1B2C3D4].mkv", seeds=3),
+            Torrent("[HorribleSubs] Show - 02 [720p].mkv", seeds=9)]))
+        self.assertEquals([(f.filename, f.seeds) for f in found],
+                          [("[HorribleSubs] Show - 02 [720p].mkv", 9),
+                           ("[Commie] Show - 01 [A1B2C3D4].mkv", 3)])
+
+    def test_without_seeds_first(self):
+        found = list(files._unique_files([Torrent("a", "a", None, 0),
+                                          Torrent("b", "a", None, 3),
+                                          Torrent("c", "a", None, 4)]))
+        self.assertEquals([(f.filename, f.seeds) for f in found],
+                          [("a", 0), ("b", 4)])
+
+
+class TestRanking(unittest.TestCase):
+
+    def setUp(self):
+        self.files = [Torrent("Show S01E01 [480p]", "a", None, 5),
+                      Torrent("Show S01E01 [720p]", "b", None, 5),
+                      Torrent("Show S01E01 [1080p]", "c", None, 1),
+                      Torrent("Show S01E01 [720p] v2", "d", None, 50)]
+
+    def test_rank(self):
+        filters = [file_filter.Quality("720p", "1080p", "Other"),
+                   file_filter.Seeds()]
+        ranking = files._Ranking(filters)
+        ranks = [sum(filt.filter(f) for filt in filters) for f in self.files]
+        self.assertEquals(map(ranking.rank, self.files), ranks)
+
+    def test_weighted(self):
+        # built by hand, loading filters from config loads every plugin
+        weighted = file_filter.Weighted.__new__(file_filter.Weighted)
+        weighted.weight = 3.0
+        weighted.filters = [file_filter.Seeds()]
+        ranking = files._Ranking([weighted])
+        for f in self.files:
+            self.assertAlmostEquals(ranking.rank(f), weighted.filter(f))
+
+
+class TestKeywordFilter(unittest.TestCase):
+
+    def test_quality(self):
+        quality = file_filter.Quality("1080p", "720p", "Other")
+        self.assertEquals(quality.filter_field(["x1080"]), 1.0)
+        self.assertAlmostEquals(quality.filter_field(["aac", "hdtv"]), 2.0 / 3)
+        self.assertEquals(quality.filter_field(["720p", "bdrip"]), 1.0)
+        self.assertAlmostEquals(quality.filter_field(["480p"]), 1.0 / 3)
+        self.assertAlmostEquals(quality.filter_field([]), 1.0 / 3)
+
+    def test_aliases_only(self):
+        # keywords with strings given are not matched by name
+        source = file_filter.Source("TV", "Other")
+        self.assertEquals(source.filter_field(["pdtv"]), 1.0)
+        self.assertEquals(source.filter_field(["tv"]), 0.5)
+        groups = file_filter.Groups("LOL", "Other")
+        self.assertEquals(groups.filter_field(["lol"]), 1.0)
+
+    def test_instances_separate(self):
+        gg = Torrent("[gg]_Show_-_01_[720p].mkv")
+        utw = Torrent("[UTW]_Show_-_01_[720p].mkv")
+        groups = file_filter.Groups("DIMENSION", "Other")
+        fansubs = file_filter.Fansubs("gg", "UTW", "Other")
+        self.assertEquals(groups.filter(gg), 0.5)
+        self.assertEquals(fansubs.filter(gg), 1.0)
+        self.assertAlmostEquals(fansubs.filter(utw), 2.0 / 3)
+        self.assertEquals(file_filter.Groups.key_str, {})
+
+    def test_without_other(self):
+        groups = file_filter.Groups("gg")
+        self.assertEquals(groups.filter(Torrent("[UTW]_Show_-_01.mkv")), 0.0)
+
+
+class TestParseFeed(unittest.TestCase):
+
+    def _parse(self, name):
+        path = os.path.join(os.path.dirname(__file__), "feeds", name)
+        with open(path) as stream:
+            items = list(feed._parse_feed(stream))
+        return [(f.get("title"), feed.get_torrent_url(f), feed.get_seeds(f),
+                 f.get("torrent_magneturi"), f.get("link")) for f in items]
+
+    def test_eztv(self):
+        items = self._parse("eztv.xml")
+        self.assertEquals([i[0] for i in items],
+                          ["Show 3x02 [HDTV - LOL]",
+                           "Show 3x01 [720P - HDTV - DIMENSION]"])
+        self.assertEquals(items[0][1], "http://torrent.zoink.it/"
+                          "Show.S03E02.HDTV.x264-LOL.[eztv].torrent")
+        self.assertEquals(items[1][1],
+                          "http://torrent.zoink.it/Show.S03E01.720p.HDTV."
+                          "X264-DIMENSION.[eztv].torrent")
+        self.assertEquals(items[0][2], None)
+        # fields of the nested ezrss torrent element
+        self.assertEquals(items[0][3],
+                          "magnet:?xt=urn:btih:2E8BCAA1C0D0D5AF2F9A26A3B0DD0A"
+                          "8E4C1D1F8B&dn=Show.S03E02.HDTV.x264-LOL")
+        self.assertEquals(items[1][3], None)
+
+    def test_namespaces(self):
+        items = self._parse("kickass.xml")
+        self.assertEquals(items[0][0],
+                          "Show S03E02 720p HDTV x264-KILLERS [eztv]")
+        self.assertEquals(items[0][1], "http://torcache.net/torrent/"
+                          "5B3C3E7D6E0CC9A1A14E1A3D3F1A21A3B7B4D0D2.torrent")
+        self.assertEquals(items[0][2], 1539)
+        self.assertTrue(items[0][3].startswith("magnet:?xt=urn:btih:5B3C"))
+        self.assertEquals(items[1][2], 0)
+
+    def test_descriptions(self):
+        items = self._parse("nyaa.xml")
+        self.assertEquals(items, [
+            ("[HorribleSubs] Show - 02 [720p].mkv", None, 2046, None,
+             "http://www.nyaa.se/?page=download&tid=612345"),
+            ("[Commie] Show - 01 [A1B2C3D4].mkv", None, 87, None,
+             "http://www.nyaa.se/?page=download&tid=611111")])
+
+    def test_atom(self):
+        items = self._parse("atom.xml")
+        self.assertEquals(items, [
+            ("Show S03E02 1080p WEB-DL DD5.1 H.264-NTb",
+             "http://example.org/download/2.torrent", 42,
+             "magnet:?xt=urn:btih:ABCD", "http://example.org/torrent/2"),
+            ("Show S03E01 1080p WEB-DL DD5.1 H.264-NTb",
+             "http://example.org/download/1.torrent", 5, None,
+             "http://example.org/torrent/1")])
+
+    def test_malformed(self):
+        # items are recovered from bad escapes, unclosed and missing tags,
+        # in the order they appear
+        items = self._parse("malformed.xml")
+        self.assertEquals(items, [
+            ("Show S03E02 HDTV x264-LOL  friends",
+             "http://example.org/2.torrent", 12, None,
+             "http://example.org/2?a=1=2"),
+            ("Show S03E01 HDTV x264-LOL", None, 9, None,
+             "http://example.org/1"),
+            ("Show S02E10 HDTV x264-LO", None, None, None, None)])
+
+
+class TestFeed(unittest.TestCase):
+
+    def setUp(self):
+        self._no_results = files._no_results
+        files._no_results = cache.ExpiringSet()
+
+    def tearDown(self):
+        files._no_results = self._no_results
+
+    def test_parse(self):
+        rss = StringIO.StringIO("""<?xml version="1.0" encoding="utf-8"?>
+<rss version="2.0" xmlns:torrent="http://xmlns.ezrss.it/0.1/">
+<channel><title>Feed</title>
+<item>
+    <title>Show S01E01 [720p]</title>
+    <link>http://feed/1</link>
+    <description><![CDATA[<b>12 seeders</b>]]></description>
+    <enclosure url="http://feed/1.torrent?key=1" length="1"
+               type="application/x-bittorrent" />
+    <!-- comment -->
+</item>
+<item>
+    <title>Show S01E02 &amp; more</title>
+    <link>http://feed/2</link>
+    <torrent:magnetURI>magnet:?xt=2</torrent:magnetURI>
+    <torrent:seeds>3</torrent:seeds>
+</item>
+</channel></rss>""")
+        items = list(feed._parse_feed(rss))
+        self.assertEquals([f["title"] for f in items],
+                          ["Show S01E01 [720p]", "Show S01E02 & more"])
+        self.assertEquals(items[0]["link"], "http://feed/1")
+        self.assertEquals(feed.get_seeds(items[0]), 12)
+        self.assertEquals(feed.get_torrent_url(items[0]),
+                          "http://feed/1.torrent")
+        self.assertEquals(feed.get_seeds(items[1]), 3)
+        self.assertEquals(items[1]["torrent_magneturi"], "magnet:?xt=2")
+        self.assertEquals(feed.get_torrent_url(items[1]), None)
+
+    def _serve(self, pages):
+        serve = _Pages(pages)
+        urlopen = feed.urllib2.urlopen
+        pages = feed._pages
+        hosts = feed._hosts
+        feed.urllib2.urlopen = serve
+        feed._pages = cache.LRUCache(2)
+        feed._hosts = {}
+
+        def restore():
+            feed.urllib2.urlopen = urlopen
+            feed._pages = pages
+            feed._hosts = hosts
+        self.addCleanup(restore)
+        return serve
+
+    def test_connections(self):
+        serve = self._serve({})
+        urls = ["http://feed/%d" % i for i in range(6)]
+        urls += ["http://other/%d" % i for i in range(6)]
+        threads = [threading.Thread(target=feed._get_feed, args=(url, 2))
+                   for url in urls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEquals(len(serve.opened), 12)
+        # two connections to each host
+        self.assertEquals(serve.most_open, 4)
+
+        # the connection is released once the page is read
+        host = feed._host("http://feed/1", 2)
+        self.assertTrue(host.acquire(False))
+        self.assertTrue(host.acquire(False))
+
+    def test_page_cache(self):
+        serve = self._serve({"http://feed/1": _rss("a"),
+                             "http://feed/2": _rss("b"),
+                             "http://feed/3": _rss("c")})
+        self.assertEquals(feed._get_feed("http://feed/1")[0]["link"], "a")
+        feed._get_feed("http://feed/1")
+        self.assertEquals(serve.opened, ["http://feed/1"])
+
+        # the least recently used page is dropped
+        feed._get_feed("http://feed/2")
+        feed._get_feed("http://feed/1")
+        feed._get_feed("http://feed/3")
+        feed._get_feed("http://feed/1")
+        feed._get_feed("http://feed/2")
+        self.assertEquals(serve.opened, ["http://feed/1", "http://feed/2",
+                                         "http://feed/3", "http://feed/2"])
+
+        # empty pages are not kept
+        feed._get_feed("http://feed/4")
+        feed._get_feed("http://feed/4")
+        self.assertEquals(serve.opened[-2:], ["http://feed/4"] * 2)
+
+    def test_page_one_skipped(self):
+        serve = self._serve({"http://feed/show/1": _rss("a", "b"),
+                             "http://feed/show/2": _rss("b", "c"),
+                             "http://feed/show/3": _rss("a", "b")})
+        source = Feed("http://feed/{s}/{p}", num_pages=5, connections=1)
+        found = [f.filename for f in source.search("show")]
+        self.assertEquals(found, ["Show a", "Show b", "Show c"])
+        # page 3 repeats page 1, so the search stops there
+        self.assertEquals(len(serve.opened), 3)
+
+    def test_pages(self):
+        feed = _Feed(3, 10)
+        found = list(feed.search("show"))
+        self.assertEquals(feed.most_open, 2)
+        self.assertEquals(len(found), 6)
+        # only the pages in the last window are fetched for nothing
+        self.assertEquals(sorted(feed.fetched), [1, 2, 3, 4])
+
+    def test_terms_at_once(self):
+        feed = _Feed(1, 1, connections=4)
+        self.assertEquals(len(list(feed._search(["a", "b", "c", "d"]))), 8)
+        self.assertEquals(feed.most_open, 4)
+
+    def test_threads_kept(self):
+        # searches and pages reuse the same threads
+        feed = _Feed(3, 4, connections=4)
+        for i in range(5):
+            list(feed._search(["a", "b", "c", "d"]))
+        self.assertEquals(len(feed.fetched), 5 * 4 * 4)
+        self.assertLessEqual(len(feed.threads), 4 + _page_threads)
+
+
+class TestSelectFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.show = _show()
+        self.ranking = files._Ranking([file_filter.Seeds()])
+
+    def _select(self, found):
+        plan = files._search_plan(self.show)
+        found = dict((id_, [Torrent(*f) for f in fs]) for id_, fs in found)
+        return sorted((f.url, sorted(ep.id for ep in eps))
+                      for entry, f, eps in
+                      files._select_files(plan, found, self.ranking))
+
+    def test_episodes(self):
+        selected = self._select([
+            (("Show", 1, 1), [("Show S01E01", "a", None, 5),
+                              ("Show S01E01", "b", None, 50)]),
+            (("Show", 2, 2), [("Show S02E02", "c", None, 5)])])
+        self.assertEquals(selected, [("b", [("Show", 1, 1)]),
+                                     ("c", [("Show", 2, 2)])])
+
+    def test_season_batch(self):
+        # a batch is chosen over episodes, unless mostly unwanted
+        season = ("Show S01", "s", None, 5)
+        found = [(("Show", 1), [season]),
+                 (("Show", 1, 1), [("Show S01E01", "a", None, 5)]),
+                 (("Show", 1, 2), [("Show S01E02", "b", None, 5)])]
+        self.assertEquals(self._select(found),
+                          [("s", [("Show", 1, 1), ("Show", 1, 2)])])
+
+        self.show[1][2].wanted = False
+        self.assertEquals(self._select(found), [("a", [("Show", 1, 1)])])
+
+    def test_range(self):
+        selected = self._select([
+            (("Show", 2, 1), [("Show S02E01-02", "r", None, 5),
+                              ("Show S02E01", "a", None, 5)]),
+            (("Show", 2, 2), [("Show S02E01-02", "r", None, 5)])])
+        self.assertEquals(selected,
+                          [("r", [("Show", 2, 1), ("Show", 2, 2)])])
+
+    def test_without_links(self):
+        plan = files._search_plan(self.show)
+        found = {("Show", 1, 1): [Torrent("Show S01E01")],
+                 ("Show", 1, 2): [Torrent("Show S01E02")]}
+        selected = sorted((f.filename, [ep.id for ep in eps])
+                          for entry, f, eps in
+                          files._select_files(plan, found, self.ranking))
+        self.assertEquals(selected, [("Show S01E01", [("Show", 1, 1)]),
+                                     ("Show S01E02", [("Show", 1, 2)])])
+
+
+class TestWantedFiles(unittest.TestCase):
+
+    def test_season_pack(self):
+        show = _show()
+        paths = ["Show S01/Show.S01E01.720p.mkv",
+                 "Show S01/Show.S01E02.720p.mkv",
+                 "Show S01/Show.S01E02.720p.srt",
+                 "Show S01/Sample/Show.S01E01.sample.mkv",
+                 "Show S01/Show.S01.nfo",
+                 "Show/Season 2/Show - 01.mkv",
+                 "Show S01/02 - Title.mkv"]
+        self.assertEquals(files.wanted_files(paths, [show[1][2]]),
+                          [False, True, True, False, False, False, True])
+        self.assertEquals(files.wanted_files(paths, []), [False] * 7)
+
+
+class TestDownload(unittest.TestCase):
+
+    def setUp(self):
+        self.show = _show()
+        self._downloader = downloader._downloader
+        self.addCleanup(setattr, downloader, "_downloader", self._downloader)
+        self.addCleanup(downloader._downloads.clear)
+
+    def _download(self, client, torrent, episodes=None):
+        downloader._downloader = lambda: client
+        return downloader.download(self.show[1], torrent, episodes)
+
+    def test_episodes_marked(self):
+        client = _Downloader()
+        torrent = Torrent("Show S01E01", "a")
+        self.assertTrue(self._download(client, torrent, [self.show[1][1]]))
+        self.assertEquals(client.downloads, [(torrent, [self.show[1][1]])])
+        # only episodes in the file are no longer wanted
+        self.assertEquals(self.show[1].epwanted, [self.show[1][2]])
+
+        # already downloading
+        self.assertFalse(self._download(client, torrent))
+        self.assertEquals(self.show[1].epwanted, [self.show[1][2]])
+
+    def test_failed(self):
+        torrent = Torrent("Show S01", "a")
+        self.assertFalse(self._download(_Downloader(True), torrent))
+        self.assertEquals(self.show[1].num_wanted, 2)
+        self.assertEquals(downloader.get_downloads(), {})
+
+
+class TestFindAllFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.show = _show()
+
+    def _find(self, *sources):
+        found = files._find_all_files([self.show[1][1]], sources)
+        return [f.filename for f in found[self.show[1][1].id]]
+
+    def test_parallel(self):
+        # each source only finds its file once all of them have started
+        started = []
+        all_started = threading.Event()
+
+        def wait():
+            started.append(None)
+            if len(started) == 3:
+                all_started.set()
+            return all_started.wait(1.0)
+
+        found = self._find(*[_SlowSource(f, wait, 2.0) for f in "abc"])
+        self.assertEquals(found, ["a", "b", "c"])
+
+    def test_partial_results(self):
+        release = threading.Event()
+
+        def fail():
+            raise exception.PluginError(_SlowSource, "Source failed")
+
+        def error():
+            raise ValueError("Broken source")
+
+        try:
+            found = self._find(_SlowSource("a"), _SlowSource("b", fail),
+                               _SlowSource("c", error),
+                               _SlowSource("d", release.wait),
+                               _SlowSource("e"))
+        finally:
+            release.set()
+        self.assertEquals(found, ["a", "e"])
+
+    def test_timeout(self):
+        self.assertEquals(files.FileSource.timeout, 120)
+        self.assertEquals(files.FileSource(30).timeout, 30)
+        self.assertEquals(Feed("http://feed/{s}", timeout=10).timeout, 10)
+
+    def test_children_skipped(self):
+        source = _SlowSource("a")
+        searched = []
+        source.find_all = lambda entries: (
+            searched.extend(entries) or
+            dict((e.id, [Torrent("a", url="a")]) for e in entries))
+
+        # the show is wanted, so finding it covers its seasons and episodes
+        entries = [self.show, self.show[1], self.show[1][1]]
+        found = files._find_all_files(entries, [source])
+        self.assertEquals(searched, [self.show])
+        self.assertEquals(found.keys(), [self.show.id])
+
+        # children of mostly unwanted entries are searched as well
+        self.show[1][2].wanted = False
+        self.show[2][1].wanted = False
+        del searched[:]
+        files._find_all_files(entries, [source])
+        self.assertEquals(searched, entries)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import unittest
+import sys
+import threading
+from nab.show import Show
+from nab.season import Season
+from nab.episode import Episode
+from nab.show_manager import ShowTree
+from nab import show_elem
+
+
+class _Show(Show):
+    # don't look up show data in any databases
+    def update_data(self):
+        pass
+
+
+def _season(show, num, aired):
+    season = Season(show, num)
+    for epnum, ep_aired in enumerate(aired, 1):
+        season[epnum] = Episode(season, epnum, "Episode %d" % epnum, ep_aired)
+    return season
+
+
+class TestAggregates(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = _Show("Show")
+        self.tree[0] = _season(self.tree, 0, [50.0])
+        self.tree[1] = _season(self.tree, 1, [10.0, 20.0, None])
+        self.tree[2] = _season(self.tree, 2, [30.0, 40.0])
+
+    def test_aired(self):
+        self.assertEquals(self.tree.aired, 10.0)
+        self.assertEquals(self.tree.aired_max, 50.0)
+
+        self.tree[1][3].aired = 5.0
+        self.assertEquals(self.tree.aired, 5.0)
+        self.assertEquals(self.tree[1].aired, 5.0)
+
+        self.tree[0][1].aired = None
+        self.assertEquals(self.tree.aired_max, 40.0)
+
+    def test_wanted(self):
+        self.assertEquals(self.tree.num_wanted, 6)
+        self.assertTrue(self.tree.wanted)
+
+        self.tree[1][1].wanted = False
+        self.tree[1][2].wanted = False
+        self.assertEquals(self.tree.num_wanted, 4)
+        self.assertEquals(self.tree[1].num_wanted, 1)
+        self.assertFalse(self.tree.wanted)
+        self.assertNotIn(self.tree[1][1], self.tree.wanted_set)
+        self.assertEquals(self.tree.epwanted,
+                          [self.tree[0][1], self.tree[1][3],
+                           self.tree[2][1], self.tree[2][2]])
+
+        self.tree[1][1].wanted = True
+        self.assertEquals(self.tree.num_wanted, 5)
+        self.assertTrue(self.tree.wanted)
+
+    def test_children_added(self):
+        episodes = self.tree.episodes
+        self.assertEquals(len(episodes), 6)
+
+        self.tree[2][3] = Episode(self.tree[2], 3, "Episode 3", 60.0)
+        self.assertEquals(len(self.tree.episodes), 7)
+        self.assertEquals(self.tree.aired_max, 60.0)
+        self.assertEquals(self.tree.num_wanted, 7)
+
+        self.tree[3] = _season(self.tree, 3, [70.0])
+        self.assertEquals(self.tree.episodes[-1], self.tree[3][1])
+        self.assertEquals(self.tree.aired_max, 70.0)
+
+    def test_wanted_threads(self):
+        # search workers change episodes of the same show at once
+        interval = sys.getcheckinterval()
+        sys.setcheckinterval(1)
+        try:
+            self.assertEquals(self.tree.num_wanted, 6)
+            self.tree.wanted
+
+            def toggle(episode):
+                for i in range(2000):
+                    episode.wanted = not episode.wanted
+
+            threads = [threading.Thread(target=toggle, args=(ep,))
+                       for ep in self.tree.episodes]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setcheckinterval(interval)
+
+        self.assertEquals(self.tree.num_wanted, 6)
+        self.assertEquals(self.tree._get_counts(), (5, 5))
+
+
+class TestFind(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = ShowTree()
+        self.tree["Show"] = _Show("Show: Title")
+        self.tree["Show"][1] = _season(self.tree["Show"], 1, [10.0, 20.0])
+
+    def test_find(self):
+        show = self.tree["Show"]
+        self.assertIs(self.tree.find("ShowTitle"), show)
+        self.assertIs(self.tree.find(("ShowTitle", 1)), show[1])
+        self.assertIs(self.tree.find(["ShowTitle", 1, 2]), show[1][2])
+        self.assertIsNone(self.tree.find(("ShowTitle", 1, 3)))
+        self.assertIsNone(self.tree.find(("Other",)))
+
+    def test_find_added(self):
+        show = self.tree["Show"]
+        self.tree.find("ShowTitle")
+
+        show[1][3] = Episode(show[1], 3, "Episode 3", 30.0)
+        self.assertIs(self.tree.find(("ShowTitle", 1, 3)), show[1][3])
+
+        self.tree["Other"] = _Show("Other")
+        self.assertIs(self.tree.find("Other"), self.tree["Other"])
+
+    def test_find_renamed(self):
+        show = self.tree["Show"]
+        self.tree.find("ShowTitle")
+
+        show.title = "Renamed"
+        self.assertIsNone(self.tree.find("ShowTitle"))
+        self.assertIs(self.tree.find(("Renamed", 1, 2)), show[1][2])
+
+
+class TestTitles(unittest.TestCase):
+
+    def test_shared(self):
+        a = Episode(None, 1, "".join(["Episode ", "Title"]), 10.0)
+        b = Episode(None, 2, "".join(["Episode ", "Title"]), 20.0)
+        self.assertIs(a.title, b.title)
+        self.assertIs(a.titles, b.titles)
+
+        c = Episode(None, 3, u"Episode Title", 30.0)
+        self.assertIs(a.titles, c.titles)
+
+if __name__ == '__main__':
+    unittest.main()
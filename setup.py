@@ -42,7 +42,7 @@ setup(
               'nab.plugins.shows'],
     install_requires=['appdirs', 'requests', 'tvdb_api', 'filecache',
                       'py-plex', 'watchdog', 'flask', 'pyyaml', 'memoized',
-                      'unidecode', 'munkres', 'feedparser', 'py-utorrent',
+                      'unidecode', 'munkres', 'py-utorrent',
                       'lxml', 'flask-holster'],
 
     dependency_links=[